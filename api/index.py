@@ -1,28 +1,57 @@
 import os
 import json
-from typing import List, Dict, Any
-from openai.types.chat.chat_completion_message_param import ChatCompletionMessageParam
-from pydantic import BaseModel
+import asyncio
+from functools import lru_cache
+from typing import TYPE_CHECKING, List, Dict, Any, Optional
+from pydantic import BaseModel, model_validator
 from dotenv import load_dotenv
 from fastapi import FastAPI, Query, UploadFile, File
 from fastapi.responses import StreamingResponse
-from openai import OpenAI
 from .utils.prompt import ClientMessage, convert_to_openai_messages
-from .utils.tools import get_therapist_match_data, get_messages_attribute_ids, get_therapist_profile_data
-from .utils.constants import CATEGORY_FILTERS
+from .utils.tools import get_therapist_match_data, get_messages_match_args, get_therapist_profile_data
+from .utils.ratelimit import get_limiter, UPSTREAMS, RateLimitTimeout, PRIORITY_INTERACTIVE, PRIORITY_RANKING
+from .utils.resilience import Deadline, DeadlineExceeded, CircuitOpen, get_breaker, call_timeout
+from .utils.jsonstream import JSONArrayStream
+from .utils.profile import TherapistProfile
+from .utils.jobs import JobManager, Job, QueueFull, job_key, FINISHED_STATES
+from .utils.session import Session, SessionStore
+from .utils.admission import AdmissionController, AdmissionMiddleware
+from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+    from openai.types.chat.chat_completion_message_param import ChatCompletionMessageParam
 
 
 load_dotenv(".env.local")
 
 app = FastAPI()
 
-client = OpenAI(
-    api_key=os.environ.get("GEMINI_API_KEY"),
-    base_url="https://generativelanguage.googleapis.com/v1beta/openai/",
-)
+# Per-endpoint concurrency limits with bounded, priority-ordered wait queues:
+# chat turns are admitted ahead of queued match rankings, and saturated
+# endpoints answer 503 with Retry-After instead of piling up.
+admission = AdmissionController()
+app.add_middleware(AdmissionMiddleware, controller=admission)
+
+# The OpenAI SDK is the single most expensive import in this module, so the
+# clients are built on first use instead of at import time. Each endpoint only
+# pays for the client it actually talks to.
 model = "gemini-2.5-pro"
 
 
+@lru_cache(maxsize=None)
+def get_client() -> "OpenAI":
+    """
+    Gemini client (OpenAI-compatible endpoint) used for match ranking.
+    """
+    from openai import OpenAI
+    return OpenAI(
+        api_key=os.environ.get("GEMINI_API_KEY"),
+        base_url="https://generativelanguage.googleapis.com/v1beta/openai/",
+    )
+
+
 '''
 tool_client = OpenAI(
     api_key=os.environ.get("OPENROUTER_API_KEY"),
@@ -30,25 +59,103 @@ tool_client = OpenAI(
 )
 model = "openrouter/horizon-beta" '''
 
-tool_client = OpenAI(
-    api_key=os.environ.get("OPENAI_API_KEY"),
-)
 tool_model = "o4-mini-2025-04-16"
 # model = "gpt-4o"
 
+# Longest a chat turn or transcription waits for an OpenAI limiter slot
+# before failing with RateLimitTimeout.
+OPENAI_SLOT_TIMEOUT = 10
+# Retry-After (seconds) sent when a chat turn can't get OpenAI capacity
+CHAT_RETRY_AFTER = 5
+
+
+@lru_cache(maxsize=None)
+def get_tool_client() -> "OpenAI":
+    """
+    OpenAI client used for the chat stream and audio transcription.
+    """
+    from openai import OpenAI
+    return OpenAI(
+        api_key=os.environ.get("OPENAI_API_KEY"),
+    )
+
 
 
 class Request(BaseModel):
-    messages: List[ClientMessage]
+    """
+    Either the full `messages` history, or - with a `sessionId` whose history
+    is already stored server-side - just the new `message`.
+    """
+    messages: List[ClientMessage] = []
+    sessionId: Optional[str] = None
+    message: Optional[ClientMessage] = None
+
+    @model_validator(mode="after")
+    def check_history_source(self):
+        if not self.messages and not self.sessionId:
+            raise ValueError("Either messages or sessionId is required")
+        return self
+
+
+sessions = SessionStore()
+
+
+def load_session(request: Request):
+    """
+    Session for a request carrying a sessionId, with the request applied: a
+    full `messages` list replaces the stored history, a single `message` is
+    appended. Returns (session, None), or (None, 409 response) when the
+    session is unknown (expired, evicted or never issued) and no full
+    history was sent, so the client knows to resend it.
+
+    An unknown ID is never adopted: with a full history, a new session with
+    a server-issued ID is started instead. Responses carry the ID in use in
+    the X-Session-Id header (see with_session_id).
+    """
+    session = sessions.get(request.sessionId)
+    if session is None:
+        if not request.messages:
+            return None, JSONResponse({"error": "Unknown session, resend the full messages"}, status_code=409)
+        session = sessions.create()
+        print(f"[SESSION] Unknown session, started {session.id}")
+
+    if request.messages:
+        session.reset(convert_to_openai_messages(request.messages), request.messages)
+    elif request.message is not None:
+        session.append_messages(convert_to_openai_messages([request.message]), [request.message])
+    return session, None
+
+
+def with_session_id(response, session: Optional[Session]):
+    """
+    Tell the client which session a response used; it changes when an
+    unknown session was replaced by load_session.
+    """
+    if session is not None:
+        response.headers["X-Session-Id"] = session.id
+    return response
+
+
+@app.post("/api/sessions")
+def create_session():
+    """
+    Start a server-side conversation session. Send the returned sessionId
+    with later /api/chat and /api/match-ranking requests.
+    """
+    return {"sessionId": sessions.create().id}
 
 
 available_tools = {
     "get_therapist_match_data": get_therapist_match_data
 }
 
-def stream_text(messages: List[ChatCompletionMessageParam], protocol: str = 'data'):
-    draft_tool_calls = []
-    draft_tool_calls_index = -1
+def open_chat_stream(messages: List["ChatCompletionMessageParam"]):
+    """
+    Start the chat completion stream. Called before the StreamingResponse is
+    built, so RateLimitTimeout and CircuitOpen can still become a 503 instead
+    of an empty 200 stream.
+    """
+    from .utils.constants import CATEGORY_FILTERS
 
     # Add system prompt for therapist matching chatbot
     system_prompt = f"""You are a concise, direct therapist matching assistant. Your job is to help users find the best therapist available in Toronto Ontario for their needs by gathering information about their situation and preferences.
@@ -78,31 +185,42 @@ Start by asking what brings them here and what they're looking for in a therapis
         messages = [{"role": "system", "content": system_prompt}] + messages
 
     print(f"\n[STREAMING] Starting AI response stream...")
-    stream = tool_client.chat.completions.create(
-        messages=messages,
-        model=tool_model,
-        stream=True,
-        tools=[{
-            "type": "function",
-            "function": {
-                "name": "get_therapist_match_data",
-                "description": "Get the number of therapists that match the chosen filters - CALL THIS WITH EVERY RESPONSE",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "attributeIds": {
-                            "type": "array",
-                            "items": {
-                                "type": "integer"
+    # The slot covers opening the stream (time to first response), not the
+    # whole generation, so streaming replies don't hold concurrency.
+    with get_breaker("openai").guard(), get_limiter("openai").slot(PRIORITY_INTERACTIVE, timeout=OPENAI_SLOT_TIMEOUT):
+        stream = get_tool_client().chat.completions.create(
+            messages=messages,
+            model=tool_model,
+            stream=True,
+            tools=[{
+                "type": "function",
+                "function": {
+                    "name": "get_therapist_match_data",
+                    "description": "Get the number of therapists that match the chosen filters - CALL THIS WITH EVERY RESPONSE",
+                    "parameters": {
+                        "type": "object",
+                        "properties": {
+                            "attributeIds": {
+                                "type": "array",
+                                "items": {
+                                    "type": "integer"
+                                },
+                                "description": "Array of attribute IDs representing the chosen filters based on user responses"
                             },
-                            "description": "Array of attribute IDs representing the chosen filters based on user responses"
                         },
-                    },
-                    "required": ["attributeIds"]
+                        "required": ["attributeIds"]
+                    }
                 }
-            }
-        }]
-    )
+            }]
+        )
+    return stream
+
+
+def stream_text(stream, protocol: str = 'data', session: Session = None):
+    draft_tool_calls = []
+    draft_tool_calls_index = -1
+    # Kept only to record the reply in the session, if there is one
+    assistant_text = []
 
     for chunk in stream:
         for choice in chunk.choices:
@@ -122,6 +240,7 @@ Start by asking what brings them here and what they're looking for in a therapis
                     tool_result = available_tools[tool_call["name"]](
                         **json.loads(tool_call["arguments"]))
                     print(f"[TOOL CALL] {tool_call['name']} completed with result length: {len(str(tool_result))}")
+                    tool_call["result"] = tool_result
 
                     yield 'a:{{"toolCallId":"{id}","toolName":"{name}","args":{args},"result":{result}}}\n'.format(
                         id=tool_call["id"],
@@ -146,6 +265,7 @@ Start by asking what brings them here and what they're looking for in a therapis
             else:
                 if choice.delta.content:
                     print(choice.delta.content, end='', flush=True)
+                    assistant_text.append(choice.delta.content)
                 yield '0:{text}\n'.format(text=json.dumps(choice.delta.content))
 
         if chunk.choices == []:
@@ -161,28 +281,56 @@ Start by asking what brings them here and what they're looking for in a therapis
                 completion=completion_tokens
             )
 
+    if session is not None:
+        session.append_assistant_turn(
+            "".join(assistant_text),
+            [tool_call for tool_call in draft_tool_calls if "result" in tool_call],
+        )
+
 
-def create_condensed_profiles(profiles: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def create_condensed_profiles(profiles: List[TherapistProfile]) -> List[Dict[str, Any]]:
     """
     Create condensed versions of profiles with only key fields for AI analysis.
     """
-    condensed = []
-    for i, profile in enumerate(profiles):
-        condensed_profile = {
-            "id": i + 1,  # Simple ID for reference
-            "listingName": profile.get("listingName", ""),
-            "healthRole": profile.get("healthRole", ""),
-            "healthRoleWriteIn": profile.get("healthRoleWriteIn", ""),
-            "personalStatement": profile.get("personalStatement", "")
-        }
-        condensed.append(condensed_profile)
-    return condensed
+    # Simple 1-based IDs for reference
+    return [profile.condensed(i + 1) for i, profile in enumerate(profiles)]
 
 NUMBER_OF_PICKED_MATCHES = 5
 
-def get_ai_ranked_matches(profiles: List[Dict[str, Any]], user_context: str = "") -> Dict[str, Any]:
+# Overall budget for one /api/match-ranking request, propagated to every
+# upstream call so a slow page or completion fails fast instead of piling up.
+MATCH_RANKING_DEADLINE = 55
+RANKING_TIMEOUT = 45
+
+RANKING_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "ranked_matches",
+        "schema": {
+            "type": "object",
+            "properties": {
+                "rankedMatches": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "originalId": {"type": "integer"},
+                            "rank": {"type": "integer"},
+                            "description": {"type": "string"}
+                        },
+                        "required": ["originalId", "rank", "description"]
+                    }
+                }
+            },
+            "required": ["rankedMatches"],
+            "additionalProperties": False
+        }
+    }
+}
+
+def build_ranking_messages(profiles: List[TherapistProfile], user_context: str = "") -> List[Dict[str, str]]:
     """
-    Use AI to analyze profiles and return ranked matches with professional descriptions.
+    Build the system and user prompts for the ranking completion.
     """
     condensed_profiles = create_condensed_profiles(profiles)
     
@@ -211,52 +359,87 @@ Base your rankings on therapeutic quality and the user's context, not just speci
 
 {f"Additional context about the patient: {user_context}" if user_context else ""}"""
 
-    messages = [
+    return [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_message}
     ]
 
-    try:
-        response = client.chat.completions.create(
+
+def validate_ranking(ranking: Any, profile_count: int, seen_ids: set) -> Dict[str, Any]:
+    """
+    Return the ranking if it refers to a profile we sent and hasn't been seen
+    yet, otherwise None.
+    """
+    if not isinstance(ranking, dict):
+        return None
+    original_id = ranking.get("originalId")
+    if not isinstance(original_id, int) or not 1 <= original_id <= profile_count or original_id in seen_ids:
+        print(f"Dropping invalid ranking: {ranking}")
+        return None
+    if not isinstance(ranking.get("rank"), int) or not isinstance(ranking.get("description"), str):
+        print(f"Dropping incomplete ranking: {ranking}")
+        return None
+    seen_ids.add(original_id)
+    return ranking
+
+
+def stream_ai_ranked_matches(profiles: List[TherapistProfile], user_context: str = "", deadline: Deadline = None):
+    """
+    Stream the ranking completion and yield each validated `rankedMatches`
+    item as soon as it is complete, so the first recommendation is usable
+    before the whole completion has arrived.
+
+    Raises json.JSONDecodeError if the finished completion isn't valid JSON.
+    """
+    messages = build_ranking_messages(profiles, user_context)
+    parser = JSONArrayStream("rankedMatches")
+    seen_ids = set()
+
+    # The slot and breaker cover the whole completion, not just opening the
+    # stream: the Gemini concurrency limit bounds running completions, the
+    # limiter learns from full completion latency, and errors mid-stream
+    # count against the breaker.
+    with get_breaker("gemini").guard(), \
+            get_limiter("gemini").slot(PRIORITY_RANKING, timeout=call_timeout(deadline, RANKING_TIMEOUT)):
+        stream = get_client().chat.completions.create(
             messages=messages,
             model=model,
-            response_format={
-                "type": "json_schema",
-                "json_schema": {
-                    "name": "ranked_matches",
-                    "schema": {
-                        "type": "object",
-                        "properties": {
-                            "rankedMatches": {
-                                "type": "array",
-                                "items": {
-                                    "type": "object",
-                                    "properties": {
-                                        "originalId": {"type": "integer"},
-                                        "rank": {"type": "integer"},
-                                        "description": {"type": "string"}
-                                    },
-                                    "required": ["originalId", "rank", "description"]
-                                }
-                            }
-                        },
-                        "required": ["rankedMatches"],
-                        "additionalProperties": False
-                    }
-                }
-            }
+            timeout=call_timeout(deadline, RANKING_TIMEOUT),
+            response_format=RANKING_RESPONSE_FORMAT,
+            stream=True,
         )
-        
-        content = response.choices[0].message.content
-        
-        # Parse the structured JSON response
         try:
-            ranking_data = json.loads(content)
-            return ranking_data
+            for chunk in stream:
+                if deadline is not None and deadline.expired():
+                    raise DeadlineExceeded("Ranking completion exceeded the request deadline")
+                for choice in chunk.choices:
+                    if not choice.delta.content:
+                        continue
+                    for item in parser.feed(choice.delta.content):
+                        ranking = validate_ranking(item, len(profiles), seen_ids)
+                        if ranking is not None:
+                            yield ranking
+        finally:
+            stream.close()
+
+    try:
+        parser.close()
+    except json.JSONDecodeError:
+        print(f"Raw response: {parser.text}")
+        raise
+
+
+def get_ai_ranked_matches(profiles: List[TherapistProfile], user_context: str = "", deadline: Deadline = None) -> Dict[str, Any]:
+    """
+    Use AI to analyze profiles and return ranked matches with professional descriptions.
+    """
+    try:
+        # Parse the structured JSON response as it streams in
+        try:
+            return {"rankedMatches": list(stream_ai_ranked_matches(profiles, user_context, deadline))}
                 
         except json.JSONDecodeError as e:
             print(f"Failed to parse AI response as JSON: {e}")
-            print(f"Raw response: {content}")
             # Return an error with fallback structure
             return {
                 "error": f"Failed to parse AI response: {str(e)}",
@@ -287,39 +470,171 @@ Base your rankings on therapeutic quality and the user's context, not just speci
 
 @app.post("/api/chat")
 async def handle_chat_data(request: Request, protocol: str = Query('data')):
-    messages = request.messages
-    openai_messages = convert_to_openai_messages(messages)
-    print(f"\n[CHAT REQUEST] Received {len(messages)} message(s)")
-    print("Messages:", openai_messages)
-    response = StreamingResponse(stream_text(openai_messages, protocol))
+    session = None
+    if request.sessionId:
+        session, error = load_session(request)
+        if error:
+            return error
+        openai_messages = session.history()
+        print(f"\n[CHAT REQUEST] Session {session.id}: {len(request.messages) or 1} new message(s), {len(openai_messages)} in history")
+    else:
+        messages = request.messages
+        openai_messages = convert_to_openai_messages(messages)
+        print(f"\n[CHAT REQUEST] Received {len(messages)} message(s)")
+        print("Messages:", openai_messages)
+    try:
+        # Waiting for a limiter slot blocks, so it runs in the threadpool
+        stream = await run_in_threadpool(open_chat_stream, openai_messages)
+    except (RateLimitTimeout, CircuitOpen) as e:
+        print(f"[CHAT REQUEST] OpenAI unavailable: {e}")
+        return with_session_id(JSONResponse({"error": "The assistant is busy, please retry shortly"},
+                                            status_code=503, headers={"Retry-After": str(CHAT_RETRY_AFTER)}), session)
+    response = StreamingResponse(stream_text(stream, protocol, session))
     response.headers['x-vercel-ai-data-stream'] = 'v1'
-    return response
+    return with_session_id(response, session)
 
 
-@app.post("/api/match-ranking")
-async def handle_match_ranking(request: Request):
+def merge_ranked_profile(profiles: List[TherapistProfile], ranking: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Get therapist matches with AI-powered rankings and professional descriptions.
+    Response dict for the ranked profile with the AI rank and description attached.
     """
-    messages = request.messages
-    attr_ids = get_messages_attribute_ids(messages)
-    data = get_therapist_match_data(attributeIds=attr_ids, limit=15)
-    profiles = get_therapist_profile_data(data.get("profiles"))
-    
+    return profiles[ranking["originalId"] - 1].to_response(ranking["rank"], ranking["description"])
+
+
+def stream_match_ranking(profiles: List[TherapistProfile], user_context: str, deadline: Deadline):
+    """
+    NDJSON body for streamed match ranking: one {"profile": ...} line per
+    ranked match as soon as the model has finished it, then a final
+    {"done": true} line, or {"aiAnalysis": {"error": ...}} on failure.
+    """
+    try:
+        for ranking in stream_ai_ranked_matches(profiles, user_context, deadline):
+            yield json.dumps({"profile": merge_ranked_profile(profiles, ranking)}) + "\n"
+        yield json.dumps({"done": True}) + "\n"
+    except Exception as e:
+        print(f"Error streaming AI rankings: {e}")
+        yield json.dumps({"aiAnalysis": {"error": f"Error getting AI rankings: {str(e)}"}}) + "\n"
+
+
+def get_user_context(messages: List[ClientMessage]) -> str:
+    """
+    Join the user's messages into free-text context for the ranker.
+    """
+    # Extract user messages to understand their needs
+    return " ".join([msg.content for msg in messages if msg.role == "user"])
+
+
+# When SEMANTIC_INDEX_PATH is set, scraped profiles are added to a local
+# vector index and only the closest matches to the user's context are sent to
+# the ranking model. The index is written by one process only (see
+# SemanticIndex) and saved in the background every
+# SEMANTIC_INDEX_FLUSH_INTERVAL seconds.
+SEMANTIC_SHORTLIST_SIZE = 10
+SEMANTIC_INDEX_FLUSH_INTERVAL = 30
+
+
+@lru_cache(maxsize=None)
+def get_semantic_index():
+    """
+    Semantic index at SEMANTIC_INDEX_PATH, or None when it isn't configured.
+    numpy is only imported when it is.
+    """
+    path = os.environ.get("SEMANTIC_INDEX_PATH")
+    if not path:
+        return None
+    from .utils.semantic_index import SemanticIndex, IndexLocked
+    try:
+        semantic_index = SemanticIndex(path)
+    except IndexLocked as e:
+        # Only one process may write the index; the others rank unshortlisted
+        print(f"Semantic index disabled in this process: {e}")
+        return None
+    semantic_index.start_autoflush(SEMANTIC_INDEX_FLUSH_INTERVAL)
+    return semantic_index
+
+
+def fetch_match_profiles(attr_ids: List[int], deadline: Deadline, progress=None, user_context: str = "",
+                         session: Session = None, location=None):
+    """
+    Search for matching listings and scrape their personal statements.
+    Returns (profiles, None), or ([], error_body) if there is nothing to rank.
+    With a session, the scraped profiles are cached per attribute ID set
+    and location.
+    """
+    cache_key = (tuple(sorted(attr_ids)), json.dumps(location, sort_keys=True))
+    cached = session.match_profiles if session is not None else None
+    if cached is not None and cached[0] == cache_key:
+        print(f"Reusing {len(cached[1])} cached profiles from session {session.id}")
+        return shortlist_for_ranking(cached[1], user_context, index_new=False), None
+
+    report = progress or (lambda stage, fraction: None)
+    report("searching", 0.05)
+    data = get_therapist_match_data(attributeIds=attr_ids, location=location, limit=15,
+                                    priority=PRIORITY_RANKING, deadline=deadline)
+    if data.get("error"):
+        return [], {"error": data.get("message")}
+
+    report("fetching_profiles", 0.2)
+    try:
+        # The search already returns compact records; the full upstream
+        # listings never leave fetch_match_results
+        profiles = get_therapist_profile_data(data["profiles"], deadline=deadline)
+    except DeadlineExceeded as e:
+        print(f"Match ranking deadline exceeded while fetching profiles: {e}")
+        return [], {"error": "Timed out fetching therapist profiles"}
+
     if not profiles:
-        return {"error": "No profiles found"}
-    
-    # Get user context from the conversation for better matching
-    user_context = ""
-    if messages:
-        # Extract user messages to understand their needs
-        user_messages = [msg for msg in messages if msg.role == "user"]
-        if user_messages:
-            user_context = " ".join([msg.content for msg in user_messages])
-    
+        return [], {"error": "No profiles found"}
+
+    if session is not None:
+        session.match_profiles = (cache_key, profiles)
+    return shortlist_for_ranking(profiles, user_context), None
+
+
+def shortlist_for_ranking(profiles: List[TherapistProfile], user_context: str, index_new: bool = True) -> List[TherapistProfile]:
+    """
+    Profiles to send to the ranker: all of them, or the semantic shortlist
+    when the index is configured. `index_new` adds them to the index first.
+    """
+    semantic_index = get_semantic_index()
+    if semantic_index is None:
+        return profiles
+    from .utils.semantic_index import shortlist_profiles
+    if index_new:
+        semantic_index.upsert_profiles(profiles)
+    return shortlist_profiles(semantic_index, profiles, user_context, SEMANTIC_SHORTLIST_SIZE)
+
+
+def resolve_ranking_inputs(request: Request):
+    """
+    Match tool arguments ({"attributeIds", "location"}), user context and
+    session for a ranking request, taken from the stored session when a
+    sessionId is given and from the posted messages otherwise. Returns
+    (match_args, user_context, session, None) or (None, None, None, error_response).
+    """
+    if not request.sessionId:
+        messages = request.messages
+        match_args = get_messages_match_args(messages)
+        print("EXTRACTED MATCH ARGS: " + str(match_args))
+        # Get user context from the conversation for better matching
+        return match_args, get_user_context(messages), None, None
+
+    session, error = load_session(request)
+    if error:
+        return None, None, None, error
+    if not session.attribute_ids:
+        return None, None, None, {"error": "No attribute IDs selected in this session yet"}
+    match_args = {"attributeIds": session.attribute_ids, "location": session.location}
+    return match_args, session.user_context(), session, None
+
+
+def rank_match_profiles(profiles: List[TherapistProfile], user_context: str, deadline: Deadline) -> Dict[str, Any]:
+    """
+    Rank the scraped profiles and build the /api/match-ranking response body.
+    """
     try:
         # Get AI rankings and descriptions
-        ai_analysis = get_ai_ranked_matches(profiles, user_context)
+        ai_analysis = get_ai_ranked_matches(profiles, user_context, deadline)
         print("SELECTED TOP MATCHES: ", len(ai_analysis.get("rankedMatches", [])))
         # Check if AI analysis returned an error
         if "error" in ai_analysis:
@@ -328,23 +643,18 @@ async def handle_match_ranking(request: Request):
                 "aiAnalysis": ai_analysis
             }
         
-        # Combine original profiles with AI rankings
-        ranked_profiles = []
-        for ranking in ai_analysis.get("rankedMatches", []):
-            original_id = ranking["originalId"] - 1  # Convert to 0-based index
-            if 0 <= original_id < len(profiles):
-                profile = profiles[original_id].copy()
-                profile["aiRank"] = ranking["rank"]
-                profile["aiDescription"] = ranking["description"]
-                ranked_profiles.append(profile)
+        # Combine original profiles with AI rankings (IDs were validated while streaming)
+        ranked_profiles = [
+            merge_ranked_profile(profiles, ranking)
+            for ranking in ai_analysis.get("rankedMatches", [])
+        ]
         
         # Sort by AI rank
-        ranked_profiles.sort(key=lambda x: x.get("aiRank", 999))
+        ranked_profiles.sort(key=lambda x: x["aiRank"])
         
-        return {
-            "profiles": ranked_profiles,
-            "aiAnalysis": ai_analysis
-        }
+        # The rankings are already merged into the profiles, so aiAnalysis is
+        # only sent back on errors.
+        return {"profiles": ranked_profiles}
         
     except Exception as e:
         print(f"Error in match-ranking endpoint: {e}")
@@ -354,24 +664,160 @@ async def handle_match_ranking(request: Request):
         }
 
 
+# Plain `def` so FastAPI runs it in the threadpool: scraping and ranking block
+# on the shared rate limiters and must not stall the event loop.
+@app.post("/api/match-ranking")
+def handle_match_ranking(request: Request, stream: bool = Query(False)):
+    """
+    Get therapist matches with AI-powered rankings and professional descriptions.
+
+    With `?stream=true` the response is NDJSON and each ranked profile is
+    sent as soon as the model has produced it (see stream_match_ranking).
+    """
+    deadline = Deadline(MATCH_RANKING_DEADLINE)
+    match_args, user_context, session, error = resolve_ranking_inputs(request)
+    if error:
+        return error
+    profiles, error = fetch_match_profiles(match_args["attributeIds"], deadline, user_context=user_context,
+                                           session=session, location=match_args.get("location"))
+    if error:
+        return error
+
+    if stream:
+        return with_session_id(StreamingResponse(stream_match_ranking(profiles, user_context, deadline),
+                                                 media_type="application/x-ndjson"), session)
+    
+    # Returning a JSONResponse skips FastAPI's jsonable_encoder pass, which
+    # would copy every nested dict again.
+    return with_session_id(JSONResponse(rank_match_profiles(profiles, user_context, deadline)), session)
+
+
+# Job mode runs outside the HTTP request, so it gets a longer budget than
+# MATCH_RANKING_DEADLINE.
+MATCH_RANKING_JOB_DEADLINE = 120
+MATCH_RANKING_WORKERS = 2
+
+
+def run_match_ranking_job(payload: Dict[str, Any], progress) -> Dict[str, Any]:
+    """
+    JobManager runner: the same pipeline as /api/match-ranking, with progress.
+    """
+    deadline = Deadline(MATCH_RANKING_JOB_DEADLINE)
+    session = sessions.get(payload["sessionId"]) if payload.get("sessionId") else None
+    profiles, error = fetch_match_profiles(payload["attributeIds"], deadline, progress, payload["userContext"],
+                                           session, payload.get("location"))
+    if error:
+        return error
+    progress("ranking", 0.6)
+    return rank_match_profiles(profiles, payload["userContext"], deadline)
+
+
+match_ranking_jobs = JobManager(run_match_ranking_job, workers=MATCH_RANKING_WORKERS)
+
+
+@app.post("/api/match-ranking/jobs")
+def submit_match_ranking_job(request: Request):
+    """
+    Queue a match-ranking job and return its ID at once. Poll
+    GET /api/match-ranking/jobs/{jobId} or subscribe to .../events (SSE).
+    An identical job (same attribute IDs, location and context) that is still queued
+    or running is reused instead of starting another.
+    """
+    match_args, user_context, session, error = resolve_ranking_inputs(request)
+    if error:
+        return error
+    attr_ids, location = match_args["attributeIds"], match_args.get("location")
+    try:
+        job = match_ranking_jobs.submit(
+            job_key(sorted(attr_ids), location, user_context),
+            {"attributeIds": attr_ids, "location": location, "userContext": user_context,
+             "sessionId": session.id if session else None},
+        )
+    except QueueFull as e:
+        return JSONResponse({"error": str(e)}, status_code=503, headers={"Retry-After": "5"})
+    return with_session_id(JSONResponse({"jobId": job.id, "status": job.status}), session)
+
+
+@app.get("/api/match-ranking/jobs/{job_id}")
+def get_match_ranking_job(job_id: str):
+    job = match_ranking_jobs.get(job_id)
+    if job is None:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+    return JSONResponse(job.snapshot())
+
+
+JOB_EVENTS_POLL_INTERVAL = 0.5
+JOB_EVENTS_KEEPALIVE = 15
+
+
+async def stream_job_events(job: Job):
+    """
+    Server-sent events for a job: one `data:` event per change, ending once
+    the job has finished. Comment lines keep idle connections open.
+
+    Async and polling, so subscribers wait on the event loop instead of each
+    holding a threadpool thread for the whole job.
+    """
+    version = -1
+    idle = 0.0
+    while True:
+        version, snapshot = job.changes_since(version)
+        if snapshot is None:
+            await asyncio.sleep(JOB_EVENTS_POLL_INTERVAL)
+            idle += JOB_EVENTS_POLL_INTERVAL
+            if idle >= JOB_EVENTS_KEEPALIVE:
+                idle = 0.0
+                yield ": keep-alive\n\n"
+            continue
+        idle = 0.0
+        yield f"data: {json.dumps(snapshot)}\n\n"
+        if snapshot["status"] in FINISHED_STATES:
+            return
+
+
+@app.get("/api/match-ranking/jobs/{job_id}/events")
+def get_match_ranking_job_events(job_id: str):
+    job = match_ranking_jobs.get(job_id)
+    if job is None:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+    return StreamingResponse(stream_job_events(job), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/api/admission/metrics")
+def get_admission_metrics():
+    """
+    Admission queue depth and rejection counters, plus upstream limiter and
+    job queue stats.
+    """
+    return JSONResponse({
+        "admission": admission.metrics(),
+        "upstreams": {name: get_limiter(name).stats() for name in UPSTREAMS},
+        "matchRankingJobs": match_ranking_jobs.stats(),
+    })
+
+
+# Plain `def` so FastAPI runs it in the threadpool: waiting for an OpenAI
+# limiter slot blocks and must not stall the event loop.
 @app.post("/api/transcribe")
-async def handle_transcribe(audio_file: UploadFile = File(...)):
+def handle_transcribe(audio_file: UploadFile = File(...)):
     try:
         print(f"Receiving audio file: {audio_file.filename}, Content-Type: {audio_file.content_type}")
         
         # Read the file content
-        audio_content = await audio_file.read()
+        audio_content = audio_file.file.read()
         print(f"Audio content length: {len(audio_content)} bytes")
         
         # Create a file-like object from the content
         from io import BytesIO
         audio_buffer = BytesIO(audio_content)
         audio_buffer.name = audio_file.filename or "recording.webm"
-        transcription = tool_client.audio.transcriptions.create(
-            model="whisper-1", 
-            file=audio_buffer,
-            response_format="text"
-        )
+        with get_breaker("openai").guard(), get_limiter("openai").slot(PRIORITY_INTERACTIVE, timeout=OPENAI_SLOT_TIMEOUT):
+            transcription = get_tool_client().audio.transcriptions.create(
+                model="whisper-1", 
+                file=audio_buffer,
+                response_format="text"
+            )
         
         print("Transcription: ", transcription)
         return {"text": transcription}
@@ -0,0 +1,187 @@
+import asyncio
+import itertools
+import json
+
+# Lower priority values are admitted first when requests are waiting.
+PRIORITY_LIGHT = 0
+PRIORITY_HEAVY = 1
+
+# Per-endpoint admission limits, keyed by exact request path. Requests to
+# other paths are not limited.
+#   concurrency: requests of this endpoint running at once
+#   queue:       requests allowed to wait for a slot; beyond that, 503 at once
+#   timeout:     seconds a request may wait before getting a 503
+#   retry_after: Retry-After (seconds) sent with the 503
+ENDPOINT_LIMITS = {
+    "/api/chat": {"priority": PRIORITY_LIGHT, "concurrency": 16, "queue": 32, "timeout": 5, "retry_after": 2},
+    "/api/transcribe": {"priority": PRIORITY_LIGHT, "concurrency": 8, "queue": 16, "timeout": 5, "retry_after": 2},
+    "/api/match-ranking": {"priority": PRIORITY_HEAVY, "concurrency": 4, "queue": 8, "timeout": 10, "retry_after": 10},
+}
+
+# Requests running at once across all limited endpoints; keeps heavy work
+# from taking every worker thread.
+TOTAL_CONCURRENCY = 24
+
+
+class EndpointState:
+    def __init__(self, path, priority, concurrency, queue, timeout, retry_after):
+        self.path = path
+        self.priority = priority
+        self.concurrency = concurrency
+        self.max_queue = queue
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.active = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+
+    def metrics(self):
+        return {
+            "priority": self.priority,
+            "concurrencyLimit": self.concurrency,
+            "active": self.active,
+            "queued": self.queued,
+            "queueLimit": self.max_queue,
+            "admitted": self.admitted,
+            "rejectedQueueFull": self.rejected_full,
+            "rejectedTimeout": self.rejected_timeout,
+        }
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "state", "future")
+
+    def __init__(self, priority, seq, state, future):
+        self.priority = priority
+        self.seq = seq
+        self.state = state
+        self.future = future
+
+
+class AdmissionController:
+    """
+    Per-endpoint concurrency limits under a shared total, with bounded
+    priority-ordered wait queues. Whenever a slot frees up, the waiting
+    request with the lowest priority value whose endpoint has room goes
+    next, so light chat turns overtake queued ranking requests.
+
+    All methods run on the event loop thread, so no locking is needed.
+    """
+
+    def __init__(self, endpoint_limits=ENDPOINT_LIMITS, total_concurrency=TOTAL_CONCURRENCY):
+        self.endpoints = {path: EndpointState(path, **limits) for path, limits in endpoint_limits.items()}
+        self.total_concurrency = total_concurrency
+        self.in_flight = 0
+        self._waiters = []
+        self._counter = itertools.count()
+
+    async def acquire(self, state):
+        """
+        Wait for a slot. Returns False if the request should be rejected
+        because the queue is full or it waited longer than the endpoint's timeout.
+        """
+        waiter = _Waiter(state.priority, next(self._counter), state, asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        state.queued += 1
+        self._dispatch()
+        if waiter.future.done():
+            return True
+
+        if state.queued > state.max_queue:
+            self._drop(waiter)
+            state.rejected_full += 1
+            return False
+
+        try:
+            await asyncio.wait({waiter.future}, timeout=state.timeout)
+        except asyncio.CancelledError:
+            # Cancelled after _dispatch granted the slot but before this
+            # coroutine resumed: the caller never gets to release it
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release(state)
+            raise
+        finally:
+            if not waiter.future.done():
+                # Timed out, or the client went away, while still queued
+                self._drop(waiter)
+        if waiter.future.done() and not waiter.future.cancelled():
+            return True
+        state.rejected_timeout += 1
+        return False
+
+    def _drop(self, waiter):
+        self._waiters.remove(waiter)
+        waiter.state.queued -= 1
+        waiter.future.cancel()
+
+    def release(self, state):
+        self.in_flight -= 1
+        state.active -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        if not self._waiters:
+            return
+        self._waiters.sort(key=lambda w: (w.priority, w.seq))
+        remaining = []
+        for waiter in self._waiters:
+            state = waiter.state
+            if self.in_flight < self.total_concurrency and state.active < state.concurrency:
+                self.in_flight += 1
+                state.active += 1
+                state.queued -= 1
+                state.admitted += 1
+                waiter.future.set_result(True)
+            else:
+                remaining.append(waiter)
+        self._waiters = remaining
+
+    def metrics(self):
+        return {
+            "inFlight": self.in_flight,
+            "totalConcurrency": self.total_concurrency,
+            "queued": len(self._waiters),
+            "endpoints": {path: state.metrics() for path, state in self.endpoints.items()},
+        }
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying an AdmissionController. The slot is held until
+    the response has been fully sent, so streaming responses count for their
+    whole duration. Saturated endpoints get 503 with Retry-After.
+    """
+
+    def __init__(self, app, controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        state = self.controller.endpoints.get(scope["path"]) if scope["type"] == "http" else None
+        if state is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await self.controller.acquire(state):
+            print(f"[ADMISSION] Rejected {scope['path']} (active {state.active}, queued {state.queued})")
+            await self._reject(state, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(state)
+
+    async def _reject(self, state, send):
+        body = json.dumps({"error": "Server is busy, please retry shortly"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(state.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -272,4 +272,21 @@ CATEGORY_FILTERS = {
         "$$ ($105 - $136)": "2",
         "$$$ (More than $136)": "3"
     }
-'''
\ No newline at end of file
+'''
+# Psychology Today search locations the app knows the upstream IDs for,
+# keyed by the name the match tool accepts. Add a city here once its
+# location ID has been confirmed against the results API.
+#
+# Only Toronto's ID is confirmed so far, so the chat tool doesn't offer a
+# location yet and every search uses DEFAULT_LOCATION. The fan-out and
+# per-location cache in tools.get_therapist_match_data are ready for when
+# a second city is added here; expose `location` in the tool schema then.
+LOCATIONS = {
+    "toronto": {
+        "id": 68684,
+        "type": "City",
+        "regionCode": "ON"
+    },
+}
+
+DEFAULT_LOCATION = "toronto"
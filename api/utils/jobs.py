@@ -0,0 +1,190 @@
+import hashlib
+import json
+import queue
+import threading
+import time
+import uuid
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_ERROR = "error"
+FINISHED_STATES = (JOB_DONE, JOB_ERROR)
+
+
+class QueueFull(Exception):
+    """
+    Raised by submit() when the job queue has no room left.
+    """
+
+
+class LocalQueueBackend:
+    """
+    In-process FIFO of job IDs. Other backends need put(), get() and size()
+    (the queue depth reported by JobManager.stats()).
+    """
+
+    def __init__(self, maxsize=0):
+        self._queue = queue.Queue(maxsize=maxsize)
+
+    def put(self, job_id):
+        try:
+            self._queue.put_nowait(job_id)
+        except queue.Full:
+            raise QueueFull("Job queue is full")
+
+    def get(self, timeout=None):
+        """
+        Next job ID, or None if nothing arrived within `timeout` seconds.
+        """
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def size(self):
+        return self._queue.qsize()
+
+
+class Job:
+    """
+    One background job. Readers poll snapshot() or changes_since().
+    """
+
+    def __init__(self, key, payload):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.payload = payload
+        self.status = JOB_QUEUED
+        self.stage = JOB_QUEUED
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def update(self, **changes):
+        with self._lock:
+            for name, value in changes.items():
+                setattr(self, name, value)
+            if self.status in FINISHED_STATES and self.finished_at is None:
+                self.finished_at = time.time()
+            self._version += 1
+
+    def snapshot(self):
+        with self._lock:
+            return self._snapshot()
+
+    def _snapshot(self):
+        return {
+            "jobId": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": round(self.progress, 2),
+            "result": self.result,
+            "error": self.error,
+        }
+
+    def changes_since(self, seen_version):
+        """
+        (version, snapshot) if the job changed after `seen_version`, else
+        (seen_version, None). Never blocks, so async readers can poll it.
+        """
+        with self._lock:
+            if self._version == seen_version:
+                return seen_version, None
+            return self._version, self._snapshot()
+
+
+def job_key(*parts):
+    """
+    Stable dedup key for a job's inputs.
+    """
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class JobManager:
+    """
+    Bounded in-process worker pool running `runner(payload, progress)` for
+    each submitted job. `progress(stage, fraction)` lets the runner report
+    where it is. Jobs with the same key share one run while it is queued or
+    running. Finished jobs stay readable for `ttl` seconds.
+
+    Workers are plain threads started on first submit, so this only helps in
+    a long-lived process (e.g. uvicorn); a serverless function may be frozen
+    as soon as the submitting response is sent.
+    """
+
+    def __init__(self, runner, workers=2, backend=None, ttl=600):
+        self.runner = runner
+        self.workers = workers
+        self.backend = backend or LocalQueueBackend(maxsize=32)
+        self.ttl = ttl
+        self._jobs = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def submit(self, key, payload):
+        """
+        Queue a job, or return the in-flight job with the same key.
+        Raises QueueFull if the backend has no room.
+        """
+        with self._lock:
+            self._evict()
+            existing = self._in_flight.get(key)
+            if existing is not None:
+                print(f"[JOBS] Reusing in-flight job {existing.id}")
+                return existing
+            job = Job(key, payload)
+            self.backend.put(job.id)
+            self._jobs[job.id] = job
+            self._in_flight[key] = job
+            self._start_workers()
+        print(f"[JOBS] Queued job {job.id}")
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queued": self.backend.size(),
+                "inFlight": len(self._in_flight),
+                "jobs": len(self._jobs),
+                "workers": len(self._threads),
+            }
+
+    def _start_workers(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f"job-worker-{len(self._threads)}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _evict(self):
+        cutoff = time.time() - self.ttl
+        for job_id, job in list(self._jobs.items()):
+            if job.finished_at is not None and job.finished_at < cutoff:
+                del self._jobs[job_id]
+
+    def _work(self):
+        while True:
+            job = self.get(self.backend.get())
+            if job is None:
+                continue
+
+            job.update(status=JOB_RUNNING, stage=JOB_RUNNING)
+            try:
+                result = self.runner(job.payload, lambda stage, fraction: job.update(stage=stage, progress=fraction))
+                job.update(status=JOB_DONE, stage=JOB_DONE, progress=1.0, result=result)
+            except Exception as e:
+                print(f"[JOBS] Job {job.id} failed: {e}")
+                job.update(status=JOB_ERROR, stage=JOB_ERROR, error=str(e))
+            finally:
+                with self._lock:
+                    if self._in_flight.get(job.key) is job:
+                        del self._in_flight[job.key]
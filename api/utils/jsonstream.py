@@ -0,0 +1,105 @@
+import json
+
+
+class JSONArrayStream:
+    """
+    Incremental parser for a streamed JSON object that yields the elements of
+    one top-level array (e.g. "rankedMatches") as soon as each is complete,
+    without waiting for the rest of the document.
+
+        parser = JSONArrayStream("rankedMatches")
+        for delta in chunks:
+            for item in parser.feed(delta):
+                ...
+        parser.close()
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_string = None
+        self._current_key = None
+        self._array_depth = None  # depth inside the target array, once found
+        self._item_start = None
+        self._done = False
+
+    def feed(self, delta):
+        """
+        Add the next chunk of text and return any array elements it completed.
+        """
+        self.text += delta
+        items = []
+        text = self.text
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._array_depth is None:
+                        self._last_string = text[self._string_start:i + 1]
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+                self._start_item(i)
+            elif ch in "{[":
+                if ch == "[" and self._depth == 1 and self._array_depth is None \
+                        and not self._done and self._current_key == self.key:
+                    self._depth += 1
+                    self._array_depth = self._depth
+                    continue
+                self._start_item(i)
+                self._depth += 1
+            elif ch in "}]":
+                if self._array_depth is not None and self._depth == self._array_depth:
+                    # closing the target array itself
+                    self._emit(i, items)
+                    self._array_depth = None
+                    self._done = True
+                    self._depth -= 1
+                    continue
+                self._depth -= 1
+                if self._array_depth is not None and self._depth == self._array_depth and self._item_start is not None:
+                    self._emit(i + 1, items)
+            elif ch == ":":
+                if self._depth == 1 and self._last_string is not None:
+                    self._current_key = json.loads(self._last_string)
+                    self._last_string = None
+            elif ch == ",":
+                if self._array_depth is not None and self._depth == self._array_depth:
+                    self._emit(i, items)
+            elif not ch.isspace():
+                self._start_item(i)
+
+        self._pos = len(text)
+        return items
+
+    def close(self):
+        """
+        Parse the complete document. Raises json.JSONDecodeError if the
+        stream did not produce valid JSON.
+        """
+        return json.loads(self.text)
+
+    def _start_item(self, i):
+        if self._array_depth is not None and self._depth == self._array_depth and self._item_start is None:
+            self._item_start = i
+
+    def _emit(self, end, items):
+        if self._item_start is None:
+            return
+        raw = self.text[self._item_start:end].strip()
+        self._item_start = None
+        if raw:
+            items.append(json.loads(raw))
@@ -0,0 +1,127 @@
+import sys
+
+# Nested listing fields kept for the results UI (see TherapistProfile in
+# components/theramatch-results.tsx); everything else in the upstream listing
+# is dropped as soon as it is parsed.
+LOCATION_FIELDS = ("postalCode", "regionName", "regionCode", "cityName", "countryCode",
+                   "phoneNumber", "addressLine1", "addressLine2")
+INTRO_VIDEO_FIELDS = ("thumbnail", "source", "width", "height", "type")
+SUFFIX_FIELDS = ("label", "isWriteIn", "type")
+
+# Low-cardinality values repeated across many listings (roles, statuses,
+# cities, credential labels) are interned so concurrent requests share them.
+INTERNED_LOCATION_FIELDS = ("regionName", "regionCode", "cityName", "countryCode")
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _pick(source, fields, interned=()):
+    if not isinstance(source, dict):
+        return None
+    return {
+        field: _intern(source[field]) if field in interned else source[field]
+        for field in fields
+        if field in source
+    }
+
+
+class TherapistProfile:
+    """
+    Compact record of one Psychology Today listing holding only what the
+    ranker and the results page use.
+    """
+
+    __slots__ = (
+        "uuid", "id", "listing_name", "verification_status", "canonical_url", "suffixes",
+        "health_role", "health_role_write_in", "intro_video", "photo_urls",
+        "primary_location", "appointment_types", "personal_statement",
+    )
+
+    def __init__(self, uuid, id, listing_name, verification_status, canonical_url, suffixes,
+                 health_role, health_role_write_in, intro_video, photo_urls,
+                 primary_location, appointment_types, personal_statement=""):
+        self.uuid = uuid
+        self.id = id
+        self.listing_name = listing_name
+        self.verification_status = verification_status
+        self.canonical_url = canonical_url
+        self.suffixes = suffixes
+        self.health_role = health_role
+        self.health_role_write_in = health_role_write_in
+        self.intro_video = intro_video
+        self.photo_urls = photo_urls
+        self.primary_location = primary_location
+        self.appointment_types = appointment_types
+        self.personal_statement = personal_statement
+
+    @classmethod
+    def from_listing(cls, listing):
+        """
+        Build a record from one entry of the results API "profiles" array.
+        """
+        photo_urls = listing.get("photoUrls") or {}
+        appointment_types = listing.get("appointmentTypes") or {}
+        return cls(
+            uuid=listing.get("uuid"),
+            id=listing.get("id"),
+            listing_name=listing.get("listingName", ""),
+            verification_status=_intern(listing.get("verificationStatus")),
+            canonical_url=listing.get("canonicalUrl"),
+            suffixes=[_pick(suffix, SUFFIX_FIELDS, interned=SUFFIX_FIELDS) for suffix in listing.get("suffixes") or []],
+            health_role=_intern(listing.get("healthRole", "")),
+            health_role_write_in=_intern(listing.get("healthRoleWriteIn", "")),
+            intro_video=_pick(listing.get("introVideo"), INTRO_VIDEO_FIELDS, interned=("type",)),
+            photo_urls={"thumbnail": photo_urls.get("thumbnail")},
+            primary_location=_pick(listing.get("primaryLocation") or {}, LOCATION_FIELDS, interned=INTERNED_LOCATION_FIELDS),
+            appointment_types={
+                "inPerson": bool(appointment_types.get("inPerson")),
+                "online": bool(appointment_types.get("online")),
+            },
+        )
+
+    def copy(self):
+        """
+        Shallow copy: nested values are shared, which is fine since only
+        personal_statement is ever reassigned.
+        """
+        clone = TherapistProfile.__new__(TherapistProfile)
+        for name in self.__slots__:
+            setattr(clone, name, getattr(self, name))
+        return clone
+
+    def condensed(self, original_id):
+        """
+        The fields the ranking model sees, keyed by its 1-based `original_id`.
+        """
+        return {
+            "id": original_id,
+            "listingName": self.listing_name,
+            "healthRole": self.health_role,
+            "healthRoleWriteIn": self.health_role_write_in,
+            "personalStatement": self.personal_statement,
+        }
+
+    def to_response(self, ai_rank=None, ai_description=None):
+        """
+        JSON-ready dict for the results page. Nested values are shared with
+        the record rather than copied.
+        """
+        return {
+            "uuid": self.uuid,
+            "id": self.id,
+            "listingName": self.listing_name,
+            "verificationStatus": self.verification_status,
+            "canonicalUrl": self.canonical_url,
+            "suffixes": self.suffixes,
+            "healthRole": self.health_role,
+            "healthRoleWriteIn": self.health_role_write_in,
+            "introVideo": self.intro_video,
+            "photoUrls": self.photo_urls,
+            "primaryLocation": self.primary_location,
+            "appointmentTypes": self.appointment_types,
+            "personalStatement": self.personal_statement,
+            "aiRank": ai_rank,
+            "aiDescription": ai_description,
+        }
@@ -1,11 +1,13 @@
 import json
 from enum import Enum
-from openai.types.chat.chat_completion_message_param import ChatCompletionMessageParam
 from pydantic import BaseModel
 import base64
-from typing import List, Optional, Any
+from typing import TYPE_CHECKING, List, Optional, Any
 from .attachment import ClientAttachment
 
+if TYPE_CHECKING:
+    from openai.types.chat.chat_completion_message_param import ChatCompletionMessageParam
+
 class ToolInvocationState(str, Enum):
     CALL = 'call'
     PARTIAL_CALL = 'partial-call'
@@ -25,7 +27,7 @@ class ClientMessage(BaseModel):
     experimental_attachments: Optional[List[ClientAttachment]] = None
     toolInvocations: Optional[List[ToolInvocation]] = None
 
-def convert_to_openai_messages(messages: List[ClientMessage]) -> List[ChatCompletionMessageParam]:
+def convert_to_openai_messages(messages: List[ClientMessage]) -> List["ChatCompletionMessageParam"]:
     openai_messages = []
 
     for message in messages:
@@ -0,0 +1,299 @@
+import heapq
+import itertools
+import sys
+import threading
+import time
+
+# Priorities for queued upstream calls; lower is served first. Interactive
+# chat turns must never wait behind ranking or speculative work.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_RANKING = 1
+PRIORITY_SPECULATIVE = 2
+
+# Per-upstream limits. `rate`/`burst` feed the token bucket, the concurrency
+# values bound the AIMD controller and `latency_target` (seconds) is the
+# latency above which a response counts as a spike even before a baseline
+# has been learned.
+UPSTREAMS = {
+    # Psychology Today results API (match counts and listings)
+    "results": {"rate": 5.0, "burst": 10, "initial_concurrency": 4, "max_concurrency": 8, "latency_target": 5.0},
+    # Psychology Today profile pages (personal statement scraping)
+    "profiles": {"rate": 4.0, "burst": 8, "initial_concurrency": 4, "max_concurrency": 8, "latency_target": 5.0},
+    # OpenAI (chat stream and transcription)
+    "openai": {"rate": 10.0, "burst": 20, "initial_concurrency": 16, "max_concurrency": 32, "latency_target": 10.0},
+    # Gemini (match ranking)
+    "gemini": {"rate": 2.0, "burst": 4, "initial_concurrency": 2, "max_concurrency": 4, "latency_target": 60.0},
+}
+
+THROTTLED_STATUS_CODES = (429, 503)
+
+
+class RateLimitTimeout(TimeoutError):
+    """
+    Raised when a request could not get an upstream slot in time.
+    """
+
+
+class SlotCancelled(Exception):
+    """
+    Raised when a caller gave up on a slot (see the `cancelled` argument of
+    UpstreamLimiter.acquire) before getting one.
+    """
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, holding at most `capacity`.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self):
+        """
+        Take a token if one is available. Returns 0 on success, otherwise the
+        number of seconds until the next token should be available.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self._refill(now)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def pause(self, seconds):
+        """
+        Stop handing out tokens for `seconds` (e.g. an upstream Retry-After).
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + seconds)
+            self._tokens = 0.0
+            self._updated = now
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD concurrency limit: grows by roughly one slot per window of successful
+    calls, halves on throttling responses and backs off gently on latency spikes.
+    """
+
+    def __init__(self, initial, maximum, minimum=1, latency_target=None,
+                 backoff=0.5, spike_backoff=0.9, spike_factor=2.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.spike_backoff = spike_backoff
+        self.spike_factor = spike_factor
+        self.baseline_latency = None
+        self._samples = 0
+
+    def on_result(self, latency, status_code=None, timed_out=False):
+        """
+        Update the limit from one completed call. A call that timed out in
+        transport is the clearest latency spike there is, so it backs off
+        like one without touching the baseline.
+        """
+        if status_code in THROTTLED_STATUS_CODES:
+            self.limit = max(self.minimum, self.limit * self.backoff)
+            return
+        if timed_out:
+            self.limit = max(self.minimum, self.limit * self.spike_backoff)
+            return
+        if latency is None:
+            return
+
+        self._samples += 1
+        if self.baseline_latency is None:
+            self.baseline_latency = latency
+        spike = (
+            (self.latency_target is not None and latency > self.latency_target)
+            or (self._samples >= 10 and latency > self.baseline_latency * self.spike_factor)
+        )
+        # Slow-moving baseline so a single spike doesn't redefine "normal"
+        self.baseline_latency += 0.05 * (latency - self.baseline_latency)
+        if spike:
+            self.limit = max(self.minimum, self.limit * self.spike_backoff)
+            return
+
+        self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+
+
+class UpstreamLimiter:
+    """
+    Token bucket plus adaptive concurrency for one upstream host. Waiters are
+    admitted in priority order (then FIFO within a priority).
+    """
+
+    def __init__(self, name, rate, burst, initial_concurrency, max_concurrency, latency_target=None):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = AdaptiveConcurrency(initial_concurrency, max_concurrency, latency_target=latency_target)
+        self.in_flight = 0
+        self._waiters = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+
+    def acquire(self, priority=PRIORITY_INTERACTIVE, timeout=None, cancelled=None):
+        """
+        Block until this caller may send a request. Raises RateLimitTimeout
+        if that takes longer than `timeout` seconds, and SlotCancelled once
+        the `cancelled` event is set (call wake() after setting it).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        entry = (priority, next(self._counter))
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    if cancelled is not None and cancelled.is_set():
+                        raise SlotCancelled(f"Gave up waiting for {self.name} slot")
+                    wait = None
+                    if self._waiters[0] == entry and self.in_flight < int(self.concurrency.limit):
+                        wait = self.bucket.try_acquire()
+                        if wait == 0:
+                            heapq.heappop(self._waiters)
+                            self.in_flight += 1
+                            # Let the next waiter re-check now that the head moved
+                            self._cond.notify_all()
+                            return
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise RateLimitTimeout(f"Timed out waiting for {self.name} rate limit")
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self._cond.wait(wait)
+            except BaseException:
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                    self._cond.notify_all()
+                raise
+
+    def release(self, latency=None, status_code=None, retry_after=None, timed_out=False):
+        """
+        Return a slot and feed the call's outcome to the controller.
+        """
+        with self._cond:
+            self.in_flight -= 1
+            self.concurrency.on_result(latency, status_code, timed_out)
+            if status_code in THROTTLED_STATUS_CODES:
+                print(f"[RATE LIMIT] {self.name} throttled ({status_code}), concurrency now {self.concurrency.limit:.1f}")
+                self.bucket.pause(retry_after if retry_after else 1.0 / self.bucket.rate)
+            self._cond.notify_all()
+
+    def wake(self):
+        """
+        Make waiting callers re-check their `cancelled` events.
+        """
+        with self._cond:
+            self._cond.notify_all()
+
+    def slot(self, priority=PRIORITY_INTERACTIVE, timeout=None, cancelled=None):
+        """
+        Context manager around acquire()/release(). Set `status_code` (and
+        optionally `retry_after`) on the returned slot once the response is in.
+        """
+        return _Slot(self, priority, timeout, cancelled)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "name": self.name,
+                "inFlight": self.in_flight,
+                "queued": len(self._waiters),
+                "concurrencyLimit": round(self.concurrency.limit, 2),
+                "baselineLatency": self.concurrency.baseline_latency,
+            }
+
+
+class _Slot:
+    def __init__(self, limiter, priority, timeout, cancelled=None):
+        self.limiter = limiter
+        self.priority = priority
+        self.timeout = timeout
+        self.cancelled = cancelled
+        self.status_code = None
+        self.retry_after = None
+        self._started = None
+
+    def __enter__(self):
+        self.limiter.acquire(self.priority, self.timeout, self.cancelled)
+        self._started = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        status_code = self.status_code
+        if status_code is None and exc is not None:
+            # requests.HTTPError carries .response, OpenAI's APIStatusError .status_code
+            status_code = getattr(exc, "status_code", None)
+            response = getattr(exc, "response", None)
+            if status_code is None and response is not None:
+                status_code = getattr(response, "status_code", None)
+        latency = time.monotonic() - self._started
+        # Failed calls without a status (resets, local errors) don't say much
+        # about healthy latency; transport timeouts are fed back as spikes.
+        self.limiter.release(
+            latency=latency if exc is None or status_code is not None else None,
+            status_code=status_code,
+            retry_after=self.retry_after,
+            timed_out=status_code is None and is_transport_timeout(exc),
+        )
+        return False
+
+
+def is_transport_timeout(exc):
+    """
+    Whether `exc` is an upstream client timeout (requests.Timeout or
+    openai.APITimeoutError). Local timeouts (RateLimitTimeout,
+    DeadlineExceeded) don't count. The client libraries are only checked if
+    already imported, so this never imports them.
+    """
+    if exc is None:
+        return False
+    requests = sys.modules.get("requests")
+    if requests is not None and isinstance(exc, requests.exceptions.Timeout):
+        return True
+    openai = sys.modules.get("openai")
+    return openai is not None and isinstance(exc, getattr(openai, "APITimeoutError", ()))
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name):
+    """
+    Shared limiter for an upstream listed in UPSTREAMS.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = UpstreamLimiter(name, **UPSTREAMS[name])
+            _limiters[name] = limiter
+        return limiter
+
+
+def parse_retry_after(headers):
+    """
+    Seconds from a Retry-After header, if present and numeric.
+    """
+    value = headers.get("Retry-After") if headers else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
@@ -0,0 +1,301 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# Thresholds for every upstream circuit breaker: consecutive failures before
+# opening, and seconds to stay open before letting a trial call through.
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_TIMEOUT = 30.0
+
+# Hedge delay used until an upstream has enough latency samples for a p95.
+DEFAULT_HEDGE_DELAY = 2.0
+MIN_HEDGE_DELAY = 0.2
+LATENCY_WINDOW = 200
+LATENCY_MIN_SAMPLES = 20
+
+
+class DeadlineExceeded(TimeoutError):
+    """
+    Raised when a request's overall deadline has passed.
+    """
+
+
+class CircuitOpen(Exception):
+    """
+    Raised instead of calling an upstream whose circuit breaker is open.
+    """
+
+
+class Deadline:
+    """
+    Absolute deadline for one request, passed down to every upstream call so
+    that per-call timeouts never outlive the request that needs them.
+    """
+
+    def __init__(self, seconds):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return self.expires_at - time.monotonic()
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def timeout(self, cap=None):
+        """
+        Seconds a single call may take: what's left of the deadline, capped at
+        `cap`. Raises DeadlineExceeded if nothing is left.
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded("Request deadline exceeded")
+        return remaining if cap is None else min(cap, remaining)
+
+
+def call_timeout(deadline, default):
+    """
+    Per-call timeout for an optional deadline.
+    """
+    return default if deadline is None else deadline.timeout(default)
+
+
+class CircuitBreaker:
+    """
+    Classic closed / open / half-open breaker. While open, calls fail
+    immediately with CircuitOpen; after `reset_timeout` one trial call is let
+    through and its outcome decides whether the circuit closes again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpen(f"{self.name} circuit is open")
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN:
+                if self._trial_in_flight:
+                    raise CircuitOpen(f"{self.name} circuit is half-open")
+                self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_neutral(self):
+        """
+        The call ended without telling us anything about upstream health
+        (e.g. our own deadline ran out while waiting for a slot).
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    @contextmanager
+    def guard(self):
+        """
+        Wrap one logical upstream call: fail fast while open, and record the
+        outcome on exit. Client errors (4xx other than 429) and local
+        timeouts don't count against the upstream.
+        """
+        self.before_call()
+        try:
+            yield
+        except TimeoutError:
+            # DeadlineExceeded / RateLimitTimeout are raised locally; upstream
+            # timeouts (requests.Timeout, openai.APITimeoutError) aren't
+            # TimeoutError subclasses and are counted below.
+            self.record_neutral()
+            raise
+        except Exception as e:
+            status_code = _status_code(e)
+            if status_code is not None and 400 <= status_code < 500 and status_code != 429:
+                self.record_success()
+            else:
+                self.record_failure()
+            raise
+        except BaseException:
+            self.record_neutral()
+            raise
+        self.record_success()
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    print(f"[CIRCUIT] {self.name} opened after {self.failures} failure(s)")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+def _status_code(exc):
+    status_code = getattr(exc, "status_code", None)
+    if status_code is None and getattr(exc, "response", None) is not None:
+        status_code = getattr(exc.response, "status_code", None)
+    return status_code
+
+
+class LatencyTracker:
+    """
+    Sliding window of recent successful call latencies for one upstream.
+    """
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency):
+        with self._lock:
+            self._samples.append(latency)
+
+    def percentile(self, q):
+        with self._lock:
+            if len(self._samples) < LATENCY_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def hedge_delay(self):
+        p95 = self.percentile(0.95)
+        return DEFAULT_HEDGE_DELAY if p95 is None else max(MIN_HEDGE_DELAY, p95)
+
+
+# Hedged attempts run on a pool per (upstream, priority): attempts block in
+# their upstream's rate limiter, so a shared FIFO pool would let queued
+# ranking scrapes hold every worker while an interactive search on an idle
+# upstream waits behind them. A losing attempt can't be cancelled once its
+# HTTP request is in flight; it finishes in the background and its result
+# is discarded. Attempts still waiting for a slot are abandoned instead.
+HEDGE_POOL_WORKERS = 16
+_hedge_executors = {}
+
+
+class HedgeAttempt:
+    """
+    Passed to each attempt of a hedged_call. The attempt sets `started` once
+    it holds its rate limiter slot, and should give up without sending
+    anything if `cancelled` (shared by all attempts of the call) is set
+    before then.
+    """
+
+    def __init__(self, cancelled):
+        self.started = threading.Event()
+        self.cancelled = cancelled
+
+    def won(self):
+        """
+        Call once this attempt has a usable response, before releasing its
+        slot, so attempts queued behind it give up instead of taking it.
+        """
+        self.cancelled.set()
+
+
+def get_hedge_executor(name, priority):
+    """
+    Thread pool for hedged attempts against one upstream at one priority.
+    """
+    with _registry_lock:
+        executor = _hedge_executors.get((name, priority))
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=HEDGE_POOL_WORKERS, thread_name_prefix=f"hedge-{name}-{priority}")
+            _hedge_executors[(name, priority)] = executor
+        return executor
+
+
+def hedged_call(fn, delay, deadline, executor, on_cancel=None):
+    """
+    Call `fn(attempt)`; if it hasn't finished `delay` seconds after it got
+    its slot (attempt.started), start a second identical attempt and return
+    whichever succeeds first. Time spent queued for a slot doesn't count, so
+    a saturated limiter doesn't trigger duplicates. Once an attempt wins (see
+    HedgeAttempt.won) or the call fails, attempts still waiting for a slot
+    are cancelled; `on_cancel()` is called to wake them. Only use this for
+    idempotent reads.
+
+    `deadline` bounds the whole call, including waiting for the first
+    attempt's slot; attempts run on `executor` (see get_hedge_executor).
+    """
+    attempts = {}
+    cancelled = threading.Event()
+
+    def submit():
+        attempt = HedgeAttempt(cancelled)
+
+        def run():
+            try:
+                return fn(attempt)
+            finally:
+                attempt.started.set()
+
+        attempts[executor.submit(run)] = attempt
+
+    def remaining():
+        return max(deadline.remaining(), 0)
+
+    try:
+        submit()
+        first_future, first = next(iter(attempts.items()))
+        first.started.wait(remaining())
+        done, _ = wait([first_future], timeout=min(delay, remaining()))
+        if not done and not deadline.expired():
+            submit()
+
+        pending = set(attempts)
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=remaining(), return_when=FIRST_COMPLETED)
+            if not done:
+                raise DeadlineExceeded("Request deadline exceeded")
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+    finally:
+        cancelled.set()
+        if on_cancel is not None and len(attempts) > 1:
+            on_cancel()
+
+
+_breakers = {}
+_trackers = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(name):
+    """
+    Shared circuit breaker for an upstream.
+    """
+    with _registry_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+def get_latency_tracker(name):
+    """
+    Shared latency window for an upstream.
+    """
+    with _registry_lock:
+        if name not in _trackers:
+            _trackers[name] = LatencyTracker()
+        return _trackers[name]
@@ -0,0 +1,256 @@
+import atexit
+import fcntl
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+# Statements hash to ~300 unigram and bigram buckets each. With 4096
+# dimensions that is under 10% of the space, so document frequencies (and
+# IDF) stay informative and collisions don't dominate cosine scores; at 256,
+# two thirds of every row was filled and IDF was nearly flat. A 10k-profile
+# matrix is ~160 MB (memory-mapped); scoring the 15 scraped candidates of a
+# ranking request stays well under a millisecond.
+DEFAULT_DIM = 4096
+INITIAL_CAPACITY = 1024
+
+VECTORS_FILE = "vectors.f32"
+DF_FILE = "df.npy"
+META_FILE = "meta.json"
+LOCK_FILE = "writer.lock"
+
+STOPWORDS = frozenset("""
+a about an and are as at be been but by can do for from have help i in is it
+its my of on or our so that the their them they this to we what when who will
+with you your
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+
+def tokenize(text):
+    """
+    Lowercased word unigrams and bigrams, without stopwords.
+    """
+    words = [word for word in _TOKEN_RE.findall((text or "").lower()) if word not in STOPWORDS and len(word) > 1]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def _bucket(token, dim):
+    # Stable across processes, unlike hash(); the sign bit halves the bias
+    # that collisions add to dot products.
+    digest = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+    return digest % dim, 1.0 if digest >> 63 else -1.0
+
+
+def hashed_tf(text, dim=DEFAULT_DIM):
+    """
+    Signed, hashed, sublinear term-frequency vector for `text`.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    for token, count in Counter(tokenize(text)).items():
+        bucket, sign = _bucket(token, dim)
+        vector[bucket] += sign * (1.0 + math.log(count))
+    return vector
+
+
+def profile_text(profile):
+    """
+    Text indexed for a TherapistProfile: role fields plus personal statement.
+    """
+    return " ".join(filter(None, [profile.health_role, profile.health_role_write_in, profile.personal_statement]))
+
+
+class IndexLocked(RuntimeError):
+    """
+    Raised when another process already has the index open for writing.
+    """
+
+
+class SemanticIndex:
+    """
+    Hashed TF-IDF vectors of therapist profiles in a memory-mapped float32
+    matrix (one unit-length row per profile) for cosine top-k lookups.
+
+    Rows hold TF vectors only; IDF weights are applied to the query, so rows
+    never need rewriting as document frequencies change and profiles can be
+    added one at a time as their statements are scraped.
+
+    On disk, `path` is a directory with vectors.f32 (capacity x dim),
+    df.npy (per-bucket document frequency) and meta.json (dim, ids).
+
+    Single writer: IDs and row assignment live in this process's memory, so
+    two processes appending to the same directory would corrupt it. Opening
+    takes an exclusive lock on writer.lock and raises IndexLocked if another
+    process holds it (e.g. another `uvicorn --workers` process).
+    """
+
+    def __init__(self, path, dim=DEFAULT_DIM):
+        self.path = path
+        self._lock = threading.RLock()
+        self._dirty = False
+        os.makedirs(path, exist_ok=True)
+
+        self._lock_file = open(os.path.join(path, LOCK_FILE), "w")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._lock_file.close()
+            raise IndexLocked(f"Semantic index at {path} is already open in another process")
+
+        meta_path = os.path.join(path, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            self.dim = meta["dim"]
+            self.ids = meta["ids"]
+            self.capacity = meta["capacity"]
+            self.df = np.load(os.path.join(path, DF_FILE))
+            self.matrix = np.memmap(os.path.join(path, VECTORS_FILE), dtype=np.float32, mode="r+",
+                                    shape=(self.capacity, self.dim))
+        else:
+            self.dim = dim
+            self.ids = []
+            self.capacity = 0
+            self.df = np.zeros(dim, dtype=np.float64)
+            self.matrix = None
+            self._grow(INITIAL_CAPACITY)
+        self._rows = {profile_id: row for row, profile_id in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _grow(self, capacity):
+        vectors_path = os.path.join(self.path, VECTORS_FILE)
+        if self.matrix is not None:
+            self.matrix.flush()
+            del self.matrix
+        # Extending the file keeps existing rows in place; the new tail reads as zeros
+        with open(vectors_path, "ab") as f:
+            f.truncate(capacity * self.dim * 4)
+        self.matrix = np.memmap(vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self.capacity = capacity
+
+    def upsert(self, profile_id, text):
+        """
+        Add or replace the vector for `profile_id`.
+        """
+        vector = hashed_tf(text, self.dim)
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        with self._lock:
+            row = self._rows.get(profile_id)
+            if row is None:
+                row = len(self.ids)
+                if row >= self.capacity:
+                    self._grow(max(INITIAL_CAPACITY, self.capacity * 2))
+                self.ids.append(profile_id)
+                self._rows[profile_id] = row
+            else:
+                self.df -= self.matrix[row] != 0
+            self.matrix[row] = vector
+            self.df += vector != 0
+            self._dirty = True
+
+    def upsert_profiles(self, profiles):
+        """
+        Index TherapistProfile records that have an ID and a personal
+        statement. Profiles whose statement is empty (e.g. the page failed
+        to load) are skipped so they don't replace a good stored vector with
+        a role-only one. Returns the number indexed.
+        """
+        indexed = 0
+        for profile in profiles:
+            if profile.id is not None and profile.personal_statement:
+                self.upsert(profile.id, profile_text(profile))
+                indexed += 1
+        return indexed
+
+    def query_vector(self, text):
+        """
+        Unit-length IDF-weighted query vector.
+        """
+        with self._lock:
+            idf = np.log((1.0 + len(self.ids)) / (1.0 + self.df)) + 1.0
+        vector = hashed_tf(text, self.dim) * idf.astype(np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def top_k(self, text, k=10, candidates=None):
+        """
+        The `k` most similar profile IDs to `text` as [(id, score)], best
+        first. `candidates` restricts the search to those profile IDs.
+        """
+        query = self.query_vector(text)
+        with self._lock:
+            if candidates is None:
+                ids = self.ids
+                scores = self.matrix[:len(ids)] @ query
+            else:
+                rows = [self._rows[c] for c in candidates if c in self._rows]
+                ids = [self.ids[row] for row in rows]
+                scores = self.matrix[rows] @ query if rows else np.zeros(0, dtype=np.float32)
+        if len(scores) == 0:
+            return []
+        k = min(k, len(scores))
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(scores[top])[::-1]]
+        return [(ids[i], float(scores[i])) for i in top]
+
+    def flush(self):
+        """
+        Persist vectors and metadata.
+        """
+        with self._lock:
+            self.matrix.flush()
+            np.save(os.path.join(self.path, DF_FILE), self.df)
+            meta_path = os.path.join(self.path, META_FILE)
+            with open(meta_path + ".tmp", "w") as f:
+                json.dump({"dim": self.dim, "capacity": self.capacity, "ids": self.ids}, f)
+            os.replace(meta_path + ".tmp", meta_path)
+            self._dirty = False
+
+    def close(self):
+        """
+        Flush unsaved changes and release the writer lock.
+        """
+        if self._dirty:
+            self.flush()
+        self._lock_file.close()
+
+    def start_autoflush(self, interval):
+        """
+        Flush from a daemon thread every `interval` seconds when there are
+        unsaved changes, and once more at interpreter exit, so request
+        handlers never pay for rewriting meta.json and df.npy.
+        """
+        def run():
+            while True:
+                time.sleep(interval)
+                if self._dirty:
+                    self.flush()
+
+        threading.Thread(target=run, name="semantic-index-flush", daemon=True).start()
+        atexit.register(lambda: self._dirty and self.flush())
+
+
+def shortlist_profiles(index, profiles, user_context, k):
+    """
+    The `k` profiles most similar to `user_context`, most similar first.
+    Profiles the index doesn't know keep their original order after those.
+    """
+    if not user_context or len(profiles) <= k:
+        return profiles
+    by_id = {profile.id: profile for profile in profiles if profile.id is not None}
+    ranked = [by_id[profile_id] for profile_id, _ in index.top_k(user_context, k, candidates=list(by_id))]
+    if len(ranked) < k:
+        chosen = {id(profile) for profile in ranked}
+        ranked += [profile for profile in profiles if id(profile) not in chosen][:k - len(ranked)]
+    return ranked
@@ -0,0 +1,150 @@
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+SESSION_TTL = 60 * 60
+MAX_SESSIONS = 1000
+
+
+class Session:
+    """
+    Server-side state for one conversation: the OpenAI-format history (without
+    the system prompt), the user's messages as plain text, the latest
+    match tool arguments, and the profiles scraped for the last ranking.
+    """
+
+    def __init__(self, session_id):
+        self.id = session_id
+        self.messages = []
+        self.user_texts = []
+        self.attribute_ids = None
+        self.location = None
+        # (attribute IDs and location, scraped TherapistProfile records) from the last ranking
+        self.match_profiles = None
+        self.updated_at = time.time()
+        self.lock = threading.Lock()
+
+    def append_messages(self, openai_messages, client_messages=()):
+        """
+        Add converted messages to the history. `client_messages` are the
+        ClientMessage objects they came from, used to track user text.
+        """
+        with self.lock:
+            self.messages.extend(openai_messages)
+            self.user_texts.extend(msg.content for msg in client_messages if msg.role == "user")
+            self.updated_at = time.time()
+
+    def reset(self, openai_messages, client_messages):
+        """
+        Replace the history with a full one sent by the client.
+        """
+        with self.lock:
+            self.messages = list(openai_messages)
+            self.user_texts = [msg.content for msg in client_messages if msg.role == "user"]
+            self.attribute_ids = None
+            self.location = None
+            for message in reversed(self.messages):
+                if message["role"] == "assistant" and message.get("tool_calls"):
+                    args = json.loads(message["tool_calls"][-1]["function"]["arguments"])
+                    self.attribute_ids = args.get("attributeIds")
+                    self.location = args.get("location")
+                    break
+            self.updated_at = time.time()
+
+    def append_assistant_turn(self, text, tool_calls):
+        """
+        Record a streamed assistant reply in the same shape
+        convert_to_openai_messages produces. `tool_calls` are dicts with
+        id, name, arguments (JSON string) and result.
+        """
+        with self.lock:
+            self.messages.append({
+                "role": "assistant",
+                "content": [{"type": "text", "text": text}],
+                "tool_calls": [
+                    {
+                        "id": tool_call["id"],
+                        "type": "function",
+                        "function": {"name": tool_call["name"], "arguments": tool_call["arguments"]},
+                    }
+                    for tool_call in tool_calls
+                ] or None,
+            })
+            for tool_call in tool_calls:
+                self.messages.append({
+                    "role": "tool",
+                    "tool_call_id": tool_call["id"],
+                    "content": json.dumps(tool_call["result"]),
+                })
+                if tool_call["name"] == "get_therapist_match_data":
+                    args = json.loads(tool_call["arguments"])
+                    self.attribute_ids = args.get("attributeIds")
+                    self.location = args.get("location")
+            self.updated_at = time.time()
+
+    def user_context(self):
+        with self.lock:
+            return " ".join(self.user_texts)
+
+    def history(self):
+        with self.lock:
+            return list(self.messages)
+
+
+class InMemorySessionBackend:
+    """
+    LRU map of sessions with idle expiry. Other backends need get(), put()
+    and delete().
+    """
+
+    def __init__(self, max_sessions=MAX_SESSIONS, ttl=SESSION_TTL):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if time.time() - session.updated_at > self.ttl:
+                del self._sessions[session_id]
+                return None
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def put(self, session):
+        with self._lock:
+            self._sessions[session.id] = session
+            self._sessions.move_to_end(session.id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+class SessionStore:
+    """
+    Session lookup on top of a pluggable backend. Session IDs are only ever
+    minted here (random UUIDs), never taken from the client, so a session
+    can't be opened by guessing or choosing its ID.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or InMemorySessionBackend()
+
+    def get(self, session_id):
+        return self.backend.get(session_id)
+
+    def create(self):
+        session = Session(uuid.uuid4().hex)
+        self.backend.put(session)
+        return session
@@ -1,32 +1,109 @@
-import requests
 from .prompt import convert_to_openai_messages
+from .ratelimit import get_limiter, parse_retry_after, RateLimitTimeout, PRIORITY_INTERACTIVE, PRIORITY_RANKING
+from .resilience import (get_breaker, get_latency_tracker, get_hedge_executor, hedged_call, call_timeout,
+                         CircuitOpen, Deadline, DeadlineExceeded)
+from .profile import TherapistProfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, zip_longest
 import json
-from bs4 import BeautifulSoup
+import threading
+import time
 
-def get_therapist_match_data(attributeIds, location=None, limit=0):
+# `requests` and BeautifulSoup are imported inside the functions that use them
+# so endpoints which never hit Psychology Today (e.g. /api/transcribe) don't
+# pay for them on a cold start.
+
+PROFILE_FETCH_WORKERS = 8
+RESULTS_TIMEOUT = 10
+PROFILE_TIMEOUT = 10
+
+
+def fetch_upstream(upstream, method, url, priority=PRIORITY_INTERACTIVE, deadline=None,
+                   timeout=10, hedge=False, **kwargs):
     """
-    Get the number of therapists that match the chosen filters by calling Psychology Today API.
-    
-    Args:
-        attributeIds (list): List of attribute IDs representing the chosen filters
-        location (dict, optional): Location object with id, type, and regionCode
-        
-    Returns:
-        dict: Contains the match count and filter information
+    Send an HTTP request to an upstream through its circuit breaker and rate
+    limiter. Every attempt's timeout is capped by the request `deadline`.
+    With `hedge=True` a duplicate request is sent once the first has held
+    its slot for the upstream's p95 latency, and the first response wins.
+
+    Raises requests.RequestException for transport and HTTP errors,
+    CircuitOpen while the upstream is failing, and DeadlineExceeded /
+    RateLimitTimeout when time runs out.
     """
-    print("started with " + str(attributeIds) + " and " + str(location))
-    # Default location for Canada if not provided
-   
-    location = {
-            "id": 68684,  # Default to Toronto
-            "type": "City", 
-            "regionCode": "ON"
-        }
-        
-    if limit > 0:
-        data_mode = True
-    else:
-        data_mode = False
+    import requests
+
+    limiter = get_limiter(upstream)
+    tracker = get_latency_tracker(upstream)
+
+    def attempt(hedge_attempt=None):
+        cancelled = hedge_attempt.cancelled if hedge_attempt is not None else None
+        with limiter.slot(priority, timeout=call_timeout(deadline, timeout), cancelled=cancelled) as slot:
+            if hedge_attempt is not None:
+                hedge_attempt.started.set()
+            started = time.monotonic()
+            response = requests.request(method, url, timeout=call_timeout(deadline, timeout), **kwargs)
+            slot.status_code = response.status_code
+            slot.retry_after = parse_retry_after(response.headers)
+            if hedge_attempt is not None and response.ok:
+                hedge_attempt.won()
+        response.raise_for_status()
+        tracker.record(time.monotonic() - started)
+        return response
+
+    with get_breaker(upstream).guard():
+        if hedge:
+            # Without a request deadline, bound the slot wait plus the request
+            hedge_deadline = deadline or Deadline(2 * timeout)
+            return hedged_call(attempt, tracker.hedge_delay(), hedge_deadline,
+                               get_hedge_executor(upstream, priority), on_cancel=limiter.wake)
+        return attempt()
+
+
+MATCH_CACHE_TTL = 300
+MATCH_CACHE_SIZE = 256
+_match_cache = OrderedDict()
+_match_cache_lock = threading.Lock()
+
+
+def resolve_locations(location):
+    """
+    Normalize the `location` argument of get_therapist_match_data into a
+    list of results-API location objects. Accepts None (the default
+    location), a key of LOCATIONS, a location dict, or a list of either.
+    Raises ValueError for unknown location names.
+    """
+    from .constants import LOCATIONS, DEFAULT_LOCATION
+
+    if location is None:
+        location = DEFAULT_LOCATION
+    resolved = []
+    for entry in location if isinstance(location, list) else [location]:
+        if isinstance(entry, dict):
+            resolved.append(entry)
+        elif isinstance(entry, str) and entry.lower() in LOCATIONS:
+            resolved.append(LOCATIONS[entry.lower()])
+        else:
+            raise ValueError(f"Unknown location: {entry}")
+    return resolved or [LOCATIONS[DEFAULT_LOCATION]]
+
+
+def fetch_match_results(attributeIds, location, limit=0, priority=PRIORITY_INTERACTIVE, deadline=None):
+    """
+    (total, profiles) for one location, with the listings as compact
+    TherapistProfile records. Only the count and the records are cached, per
+    location and filter set, for MATCH_CACHE_TTL seconds; the full upstream
+    listings are dropped as soon as they are parsed. Each call gets its own
+    copies of the records, so callers may fill them in.
+    """
+    key = (json.dumps(location, sort_keys=True), tuple(sorted(attributeIds)), limit)
+    with _match_cache_lock:
+        cached = _match_cache.get(key)
+        if cached is not None and time.monotonic() - cached[0] < MATCH_CACHE_TTL:
+            _match_cache.move_to_end(key)
+            total, profiles = cached[1], cached[2]
+            return total, [profile.copy() for profile in profiles]
+
     # Prepare the request payload as specified in plan.md
     payload = {
         "attributeIds": attributeIds,
@@ -35,46 +112,113 @@ def get_therapist_match_data(attributeIds, location=None, limit=0):
         "nameSearch": "",
         "listingSearchChar": "",
         "from": 0,
-        "limit": limit,  # We only want the count, not actual results
+        "limit": limit,  # 0 means we only want the count, not actual results
         "seed": "default_seed",  # This will be generated dynamically in real implementation
         "location": location
     }
+
+    # Make the API call to Psychology Today Results API. The search is a
+    # read, so it's safe to hedge.
+    response = fetch_upstream(
+        "results",
+        "POST",
+        "https://www.psychologytoday.com/ca/therapists/results",
+        priority=priority,
+        deadline=deadline,
+        timeout=RESULTS_TIMEOUT,
+        hedge=True,
+        json=payload,
+        headers={
+            "Content-Type": "application/json",
+            "User-Agent": "PsychologyToday/1.0"
+        },
+    )
+    print("response status: " + str(response.status_code))
+    data = response.json().get("data") or {}
+    total = data.get("total", 0)
+    profiles = tuple(TherapistProfile.from_listing(listing) for listing in data.get("profiles") or [])
+    del data
+
+    with _match_cache_lock:
+        _match_cache[key] = (time.monotonic(), total, profiles)
+        _match_cache.move_to_end(key)
+        while len(_match_cache) > MATCH_CACHE_SIZE:
+            _match_cache.popitem(last=False)
+    return total, [profile.copy() for profile in profiles]
+
+
+def merge_match_results(results, limit=0):
+    """
+    Merge per-location (total, profiles) results. Profiles are interleaved
+    across locations so each one is represented, duplicates (the same
+    profile listed in several locations) are dropped, and the list is cut
+    to `limit` if given. The total is the sum of the per-location totals,
+    so it can over-count therapists listed in more than one place.
+    """
+    seen = set()
+    merged = []
+    for profile in chain.from_iterable(zip_longest(*[profiles for _, profiles in results])):
+        if profile is None:
+            continue
+        profile_id = profile.id or profile.uuid
+        # Listings without an ID can't be matched up, so they are all kept
+        if profile_id is not None:
+            if profile_id in seen:
+                continue
+            seen.add(profile_id)
+        merged.append(profile)
+    return sum(total for total, _ in results), merged[:limit] if limit else merged
+
+
+def get_therapist_match_data(attributeIds, location=None, limit=0, priority=PRIORITY_INTERACTIVE, deadline=None):
+    """
+    Get the number of therapists that match the chosen filters by calling Psychology Today API.
     
-    try:
-        # Make the API call to Psychology Today Results API
-        response = requests.post(
-            "https://www.psychologytoday.com/ca/therapists/results",
-            json=payload,
-            headers={
-                "Content-Type": "application/json",
-                "User-Agent": "PsychologyToday/1.0"
-            },
-            timeout=10
-        )
+    Args:
+        attributeIds (list): List of attribute IDs representing the chosen filters
+        location (str | dict | list, optional): A LOCATIONS key or location object with id,
+            type, and regionCode; defaults to Toronto. A list fans out one concurrent
+            search per location and merges the listings.
+        limit (int, optional): Number of listings to return; 0 returns only the count
+        priority (int, optional): Queue priority for the shared results API rate limiter
+        deadline (Deadline, optional): Overall request deadline; caps the fetch timeout
         
-        # Raise an exception for bad status codes
-        response.raise_for_status()
+    Returns:
+        dict: Contains the match count and filter information, or, when
+        limit > 0, "total" and "profiles" (TherapistProfile records)
+    """
+    import requests
+
+    print("started with " + str(attributeIds) + " and " + str(location))
         
-        # Parse the response
-        data = response.json()
+    if limit > 0:
+        data_mode = True
+    else:
+        data_mode = False
+    
+    try:
+        locations = resolve_locations(location)
+        if len(locations) == 1:
+            total_count, profiles = fetch_match_results(attributeIds, locations[0], limit, priority, deadline)
+        else:
+            # One round trip of latency for all locations instead of N
+            with ThreadPoolExecutor(max_workers=len(locations)) as executor:
+                results = list(executor.map(
+                    lambda loc: fetch_match_results(attributeIds, loc, limit, priority, deadline), locations))
+            total_count, profiles = merge_match_results(results, limit)
         
-        # Extract the total count from the response  
-        total_count = data.get("data", {}).get("total", 0)
-        print("data: " + str(data))
-        print("response status: " + str(response.status_code))
+        print("total: " + str(total_count) + " across " + str(len(locations)) + " location(s)")
         
         if data_mode:
-            return data.get("data")
+            return {"total": total_count, "profiles": profiles}
         return {
             "match_count": total_count,
             "filters_applied": attributeIds,
-            "location": location,
+            "location": locations[0] if len(locations) == 1 else locations,
             "message": f"{total_count} matching therapists"
         }
-
-
         
-    except requests.RequestException as e:
+    except (requests.RequestException, RateLimitTimeout, CircuitOpen, DeadlineExceeded, ValueError) as e:
         # Handle any errors that occur during the request
         print(f"Error fetching therapist data: {e}")
         return {
@@ -86,23 +230,23 @@ def get_therapist_match_data(attributeIds, location=None, limit=0):
         }
 
 
-def get_messages_attribute_ids(messages):
+def get_messages_match_args(messages):
     """
-    Get the attribute IDs from the messages
+    Get the arguments (attributeIds and optional location) of the last
+    match tool call in the messages
     """
     openai_messages = convert_to_openai_messages(messages)
     last_assistant = next(m for m in reversed(openai_messages) if m['role']=='assistant' and m.get('tool_calls'))
-    attr_ids = json.loads(last_assistant['tool_calls'][-1]['function']['arguments'])['attributeIds']
-    print("EXTRACTED ATTRIBUTE IDS: " + str(attr_ids))
-    return attr_ids
+    return json.loads(last_assistant['tool_calls'][-1]['function']['arguments'])
 
 
 
-def get_personal_statement_text(profile_url):
+def get_personal_statement_text(profile_url, priority=PRIORITY_RANKING, deadline=None):
     """
     Fetch the page at profile_url and return all the text
     inside elements with class 'personal-statement'.
     """
+    from bs4 import BeautifulSoup
 
     headers = {
     "User-Agent": (
@@ -115,8 +259,8 @@ def get_personal_statement_text(profile_url):
     "Referer": "https://www.google.ca/",
     }
 
-    resp = requests.get(profile_url, headers=headers)
-    resp.raise_for_status()
+    resp = fetch_upstream("profiles", "GET", profile_url, priority=priority, deadline=deadline,
+                          timeout=PROFILE_TIMEOUT, hedge=True, headers=headers)
     soup = BeautifulSoup(resp.text, 'html.parser')
 
     # find all elements with the 'personal-statement' class:
@@ -130,20 +274,33 @@ def get_personal_statement_text(profile_url):
     return ' '.join(texts)
 
 
-def get_therapist_profile_data(profiles):
+def get_therapist_profile_data(profiles, priority=PRIORITY_RANKING, deadline=None):
     """
-    Given a list of profile dicts, fetch each profile page
-    and add a 'personalStatement' field containing its text.
+    Given a list of TherapistProfile records, fetch each profile page
+    and fill in its personal_statement.
+
+    Pages are fetched concurrently; the shared "profiles" rate limiter keeps
+    the combined request rate within what psychologytoday.com tolerates.
+    A page that fails to load leaves an empty statement rather than failing
+    the whole batch; running out of `deadline` raises DeadlineExceeded.
     """
-    enriched = []
-    for profile in profiles:
-        print("profile: " + str(profile.get("listingName")))
-        url = profile.get("canonicalUrl")
-        if not url:
-            continue
-        print("url: " + str(url))
-        profile["personalStatement"] = get_personal_statement_text(url)
-        print("personalStatement: " + str(profile.get("personalStatement")))
-        print("--------------------------------")
-        enriched.append(profile)
-    return enriched
\ No newline at end of file
+    import requests
+
+    profiles = [profile for profile in profiles if profile.canonical_url]
+    if not profiles:
+        return []
+
+    def enrich(profile):
+        url = profile.canonical_url
+        print("profile: " + str(profile.listing_name) + " url: " + str(url))
+        try:
+            profile.personal_statement = get_personal_statement_text(url, priority, deadline)
+        except (requests.RequestException, RateLimitTimeout, CircuitOpen) as e:
+            print(f"Error fetching personal statement for {url}: {e}")
+            profile.personal_statement = ""
+        return profile
+
+    with ThreadPoolExecutor(max_workers=min(PROFILE_FETCH_WORKERS, len(profiles))) as executor:
+        enriched = list(executor.map(enrich, profiles))
+    print(f"Fetched {len(enriched)} personal statements")
+    return enriched
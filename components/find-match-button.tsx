@@ -26,7 +26,7 @@ interface TherapistProfile {
 
 interface MatchRankingResponse {
   profiles: TherapistProfile[];
-  aiAnalysis: {
+  aiAnalysis?: {
     rankedMatches: Array<{
       originalId: number;
       rank: number;
@@ -0,0 +1,156 @@
+"""
+Cold-start benchmark for the serverless entry point.
+
+Each sample runs in a fresh interpreter and measures:
+  - import: `import api.index` (what every cold start pays)
+  - chat: first-use cost of /api/chat (OpenAI chat resource, one match
+    count search through get_therapist_match_data)
+  - ranking: first-use cost of /api/match-ranking (Gemini chat resource,
+    listing search, profile records, personal statement scraping)
+  - transcribe: first-use cost of /api/transcribe (OpenAI audio resource)
+
+No network calls are made: Psychology Today requests go through the real
+fetch path (limiter, breaker, hedging, parsing) but are answered by a canned
+transport adapter, and the API clients are built without being called.
+
+Usage:
+    python scripts/bench_cold_start.py [--runs 10]
+    python scripts/bench_cold_start.py --save-baseline   # record current medians
+    python scripts/bench_cold_start.py --check           # exit 1 on regression
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, "scripts", "cold_start_baseline.json")
+
+# Answers every request sent through `requests` with a canned listing search
+# (POST) or profile page (GET), so the phases run the endpoints' own fetch
+# code without touching the network. The search returns no more listings
+# than the "profiles" limiter's burst, so rate pacing isn't timed.
+OFFLINE = """
+import requests
+from requests.adapters import HTTPAdapter
+from requests.models import Response
+
+def offline_send(self, request, **kwargs):
+    response = Response()
+    response.status_code = 200
+    response.url = request.url
+    response.request = request
+    if request.method == "POST":
+        listings = [{"id": i, "uuid": str(i), "listingName": f"Therapist {i}", "healthRole": "Psychotherapist",
+                      "canonicalUrl": f"https://www.psychologytoday.com/ca/therapists/{i}"} for i in range(8)]
+        response._content = json.dumps({"data": {"total": 8, "profiles": listings}}).encode()
+        response.headers["Content-Type"] = "application/json"
+    else:
+        response._content = b"<html><body><div class='personal-statement'><p>I help with anxiety.</p></div></body></html>"
+        response.headers["Content-Type"] = "text/html"
+    return response
+
+HTTPAdapter.send = offline_send
+"""
+
+PHASES = {
+    "chat": OFFLINE + """
+index.get_tool_client().chat.completions
+index.get_therapist_match_data(attributeIds=[])
+""",
+    "ranking": OFFLINE + """
+index.get_client().chat.completions
+data = index.get_therapist_match_data(attributeIds=[], limit=15, priority=index.PRIORITY_RANKING)
+profiles = index.get_therapist_profile_data(data["profiles"])
+index.build_ranking_messages(profiles, "anxiety")
+""",
+    "transcribe": "index.get_tool_client().audio.transcriptions",
+}
+
+SAMPLE = """
+import json, time
+t0 = time.perf_counter()
+import api.index as index
+t1 = time.perf_counter()
+{phase}
+t2 = time.perf_counter()
+print(json.dumps({{"import": (t1 - t0) * 1000, "first_use": (t2 - t1) * 1000}}))
+"""
+
+
+def run_sample(phase_code):
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "bench")
+    env.setdefault("GEMINI_API_KEY", "bench")
+    proc = subprocess.run(
+        [sys.executable, "-c", SAMPLE.format(phase=phase_code)],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def run_benchmark(runs):
+    imports = []
+    first_use = {name: [] for name in PHASES}
+    for _ in range(runs):
+        for name, code in PHASES.items():
+            sample = run_sample(code)
+            imports.append(sample["import"])
+            first_use[name].append(sample["first_use"])
+
+    results = {"import": statistics.median(imports)}
+    for name, samples in first_use.items():
+        results[name] = statistics.median(samples)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="fresh interpreters per phase")
+    parser.add_argument("--save-baseline", action="store_true", help=f"write medians to {os.path.relpath(BASELINE_PATH, ROOT)}")
+    parser.add_argument("--check", action="store_true", help="compare against the baseline and exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs. baseline (default 0.25 = 25%%)")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.runs)
+
+    baseline = None
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+
+    print(f"Cold start medians over {args.runs} run(s) (ms):")
+    regressions = []
+    for name, value in results.items():
+        line = f"  {name:<11} {value:8.1f}"
+        if baseline and name in baseline:
+            delta = (value - baseline[name]) / baseline[name] if baseline[name] else 0.0
+            line += f"   baseline {baseline[name]:8.1f}  ({delta:+.0%})"
+            if delta > args.tolerance:
+                regressions.append(name)
+        print(line)
+
+    if args.save_baseline:
+        with open(BASELINE_PATH, "w") as f:
+            json.dump({name: round(value, 1) for name, value in results.items()}, f, indent=2)
+            f.write("\n")
+        print(f"\nBaseline written to {os.path.relpath(BASELINE_PATH, ROOT)}")
+
+    if args.check:
+        if baseline is None:
+            print("\nNo baseline found; run with --save-baseline first.", file=sys.stderr)
+            sys.exit(2)
+        if regressions:
+            print(f"\nRegression (> {args.tolerance:.0%}) in: {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
+        print("\nNo regressions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Per-request memory benchmark for the /api/match-ranking response path.
+
+Compares the previous pipeline (full upstream listing dicts, `.copy()` per
+ranked profile, aiAnalysis echoed back, FastAPI's jsonable_encoder) with the
+compact TherapistProfile records. Each simulated request parses a synthetic
+results-API payload, attaches personal statements, merges the rankings and
+serializes the response. All requests in a round hold their data at the same
+time, like requests waiting on the ranking completion under load, and the
+tracemalloc peak is divided by the number of concurrent requests.
+
+No network or LLM calls are made.
+
+Usage:
+    python scripts/bench_profile_memory.py [--concurrency 32] [--profiles 15]
+"""
+import argparse
+import json
+import os
+import random
+import string
+import sys
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.utils.profile import TherapistProfile  # noqa: E402
+
+ROLES = ["PSYCHOTHERAPIST", "REGISTERED_SOCIAL_WORKER", "PSYCHOLOGIST", "COUNSELLOR"]
+CITIES = ["Toronto", "North York", "Etobicoke", "Scarborough"]
+NUMBER_OF_PICKED_MATCHES = 5
+
+
+def _words(rng, n):
+    return " ".join("".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(n))
+
+
+def make_payload(count, seed=0):
+    """
+    Synthetic results-API response. Besides the fields the app uses, each
+    listing carries the kind of extra data the upstream returns (attribute
+    lists, insurance, languages, fees) that the app never reads.
+    """
+    rng = random.Random(seed)
+    profiles = []
+    for i in range(count):
+        profiles.append({
+            "uuid": f"{i:08d}-0000-0000-0000-000000000000",
+            "id": 100000 + i,
+            "listingName": _words(rng, 2).title(),
+            "verificationStatus": "VERIFIED",
+            "canonicalUrl": f"https://www.psychologytoday.com/ca/therapists/x/{100000 + i}",
+            "suffixes": [{"label": "MSW", "isWriteIn": False, "type": "DEGREE"}, {"label": "RSW", "isWriteIn": False, "type": "LICENSE"}],
+            "healthRole": rng.choice(ROLES),
+            "healthRoleWriteIn": "",
+            "introVideo": None,
+            "photoUrls": {"thumbnail": f"https://photos.psychologytoday.com/{i}/120x120.jpeg",
+                          "small": f"https://photos.psychologytoday.com/{i}/160x160.jpeg",
+                          "large": f"https://photos.psychologytoday.com/{i}/400x400.jpeg"},
+            "primaryLocation": {"postalCode": "M5V 2T6", "regionName": "Ontario", "regionCode": "ON",
+                                "cityName": rng.choice(CITIES), "countryCode": "CA", "phoneNumber": "4165550000",
+                                "addressLine1": f"{rng.randint(1, 999)} King St W", "latitude": 43.6, "longitude": -79.4},
+            "appointmentTypes": {"inPerson": True, "online": True},
+            "specialties": [{"id": rng.randint(1, 2000), "name": _words(rng, 2)} for _ in range(15)],
+            "issues": [{"id": rng.randint(1, 2000), "name": _words(rng, 2)} for _ in range(20)],
+            "insurance": [_words(rng, 3) for _ in range(8)],
+            "languages": ["English", "French"],
+            "fees": {"individual": "$150", "couples": "$180", "slidingScale": True},
+            "summary": _words(rng, 80),
+        })
+    return json.dumps({"data": {"total": count, "profiles": profiles}})
+
+
+def make_statements(count, seed=1):
+    rng = random.Random(seed)
+    return [_words(rng, 250) for _ in range(count)]
+
+
+def make_rankings(count):
+    return [
+        {"originalId": i + 1, "rank": i + 1, "description": f"Recommended therapist {i + 1} for your needs. " * 4}
+        for i in range(min(count, NUMBER_OF_PICKED_MATCHES))
+    ]
+
+
+def legacy_request(payload, statements, rankings):
+    from fastapi.encoders import jsonable_encoder
+
+    profiles = json.loads(payload)["data"]["profiles"]
+    for profile, statement in zip(profiles, statements):
+        profile["personalStatement"] = statement
+    ai_analysis = {"rankedMatches": rankings}
+    ranked_profiles = []
+    for ranking in rankings:
+        profile = profiles[ranking["originalId"] - 1].copy()
+        profile["aiRank"] = ranking["rank"]
+        profile["aiDescription"] = ranking["description"]
+        ranked_profiles.append(profile)
+    body = jsonable_encoder({"profiles": ranked_profiles, "aiAnalysis": ai_analysis})
+    return profiles, json.dumps(body)
+
+
+def compact_request(payload, statements, rankings):
+    profiles = [TherapistProfile.from_listing(listing) for listing in json.loads(payload)["data"]["profiles"]]
+    for profile, statement in zip(profiles, statements):
+        profile.personal_statement = statement
+    ranked_profiles = [profiles[r["originalId"] - 1].to_response(r["rank"], r["description"]) for r in rankings]
+    return profiles, json.dumps({"profiles": ranked_profiles})
+
+
+def run(pipeline, concurrency, payload, statements, rankings):
+    """
+    Run `concurrency` requests in threads that all hold their results until
+    every request has finished, and return (peak bytes per request, seconds).
+    """
+    barrier = threading.Barrier(concurrency + 1)
+    release = threading.Event()
+    held = [None] * concurrency
+
+    def worker(i):
+        held[i] = pipeline(payload, statements[:], rankings)
+        barrier.wait()
+        release.wait()
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    release.set()
+    for thread in threads:
+        thread.join()
+    tracemalloc.stop()
+    return peak / concurrency, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=32, help="simultaneous requests")
+    parser.add_argument("--profiles", type=int, default=15, help="listings per request (the endpoint uses 15)")
+    args = parser.parse_args()
+
+    payload = make_payload(args.profiles)
+    statements = make_statements(args.profiles)
+    rankings = make_rankings(args.profiles)
+
+    # Warm up imports so they don't count towards the first pipeline
+    legacy_request(payload, statements, rankings)
+    compact_request(payload, statements, rankings)
+
+    print(f"{args.concurrency} concurrent requests, {args.profiles} profiles each\n")
+    print(f"{'pipeline':<10} {'peak KiB/request':>17} {'wall ms':>9}  response bytes")
+    results = {}
+    for name, pipeline in (("legacy", legacy_request), ("compact", compact_request)):
+        per_request, elapsed = run(pipeline, args.concurrency, payload, statements, rankings)
+        response_size = len(pipeline(payload, statements, rankings)[1])
+        results[name] = per_request
+        print(f"{name:<10} {per_request / 1024:>17.1f} {elapsed * 1000:>9.1f}  {response_size}")
+    print(f"\ncompact uses {results['compact'] / results['legacy']:.0%} of the legacy peak per request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark the semantic profile index at 10k+ profiles.
+
+Builds an index of synthetic statements in a temporary directory and
+reports build throughput, incremental upsert latency, top-k query latency
+over the whole index and over a 15-profile candidate set (what
+/api/match-ranking shortlists from), and how much the IDF weights spread:
+if the hashed dimension is too small, every bucket appears in most
+documents and IDF flattens out. No network calls are made.
+
+Usage:
+    python scripts/bench_semantic_index.py [--profiles 10000] [--queries 500] [--dim 4096]
+"""
+import argparse
+import os
+
+import numpy as np
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.utils.semantic_index import SemanticIndex, DEFAULT_DIM  # noqa: E402
+
+TOPICS = [
+    "anxiety panic worry stress", "depression low mood hopelessness", "trauma ptsd abuse recovery",
+    "couples marriage relationship conflict", "grief loss bereavement", "addiction substance alcohol recovery",
+    "adhd attention focus executive function", "eating disorders body image", "lgbtq identity gender affirming",
+    "cbt cognitive behavioural therapy", "emdr somatic mindfulness", "teens adolescents family parenting",
+]
+FILLER = "client session approach support safe space work together goals growth compassion practice experience".split()
+# Stand-in for the long tail of a real statement's vocabulary, drawn with a
+# Zipf-like skew so some words are common and most are rare.
+LONG_TAIL = [f"word{i}" for i in range(5000)]
+LONG_TAIL_WEIGHTS = [1.0 / (rank + 1) for rank in range(len(LONG_TAIL))]
+ROLES = ["PSYCHOTHERAPIST", "REGISTERED_SOCIAL_WORKER", "PSYCHOLOGIST", "COUNSELLOR"]
+
+
+def make_statement(rng, words=250):
+    topics = rng.sample(TOPICS, 2)
+    vocab = " ".join(topics).split() + FILLER
+    tail = rng.choices(LONG_TAIL, weights=LONG_TAIL_WEIGHTS, k=words // 2)
+    return " ".join([rng.choice(vocab) for _ in range(words - len(tail))] + tail)
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=DEFAULT_DIM)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    texts = [f"{rng.choice(ROLES)} {make_statement(rng)}" for _ in range(args.profiles)]
+    queries = [make_statement(rng, words=30) for _ in range(args.queries)]
+
+    with tempfile.TemporaryDirectory() as path:
+        index = SemanticIndex(path, dim=args.dim)
+        started = time.perf_counter()
+        for profile_id, text in enumerate(texts):
+            index.upsert(profile_id, text)
+        index.close()
+        build = time.perf_counter() - started
+
+        # Reopen so queries run against the memory-mapped file
+        index = SemanticIndex(path)
+        size_mb = os.path.getsize(os.path.join(path, "vectors.f32")) / 1e6
+
+        upserts = []
+        for i in range(200):
+            started = time.perf_counter()
+            index.upsert(args.profiles + i, texts[i])
+            upserts.append(time.perf_counter() - started)
+
+        full, encode, candidates = [], [], []
+        for query in queries:
+            started = time.perf_counter()
+            index.query_vector(query)
+            encode.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            index.top_k(query, k=10)
+            full.append(time.perf_counter() - started)
+
+            subset = rng.sample(range(args.profiles), 15)
+            started = time.perf_counter()
+            index.top_k(query, k=10, candidates=subset)
+            candidates.append(time.perf_counter() - started)
+
+        fill = float(np.count_nonzero(index.matrix[:len(index)], axis=1).mean())
+        with index._lock:
+            idf = np.log((1.0 + len(index)) / (1.0 + index.df[index.df > 0])) + 1.0
+
+    print(f"{args.profiles} profiles, dim {args.dim}, matrix file {size_mb:.1f} MB")
+    print(f"buckets used per profile: {fill:.0f} of {args.dim} ({fill / args.dim:.0%})")
+    print(f"IDF over used buckets: min {idf.min():.2f}  median {np.median(idf):.2f}  max {idf.max():.2f}")
+    print(f"build: {build:.2f}s ({args.profiles / build:,.0f} profiles/s)")
+    print(f"{'':<24} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, samples in (("incremental upsert", upserts), ("query encode", encode),
+                          ("top-10 over all", full), ("top-10 of 15 candidates", candidates)):
+        print(f"{name:<24} {statistics.median(samples) * 1000:>8.3f} {percentile(samples, 0.99) * 1000:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Build (or update) the semantic profile index offline.
+
+Input is a JSON array or JSON-lines file of Psychology Today listings, e.g.
+saved results-API "profiles" arrays. Each listing should carry a
+"personalStatement"; pass --scrape to fetch missing statements from the
+listing's canonicalUrl.
+
+Usage:
+    python scripts/build_semantic_index.py listings.json --out /tmp/theramatch-index [--scrape]
+
+Point SEMANTIC_INDEX_PATH at the output directory to use it in the API.
+The index is single-writer, so run this while the API isn't using it.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.utils.profile import TherapistProfile  # noqa: E402
+from api.utils.semantic_index import SemanticIndex, DEFAULT_DIM  # noqa: E402
+
+
+def load_listings(path):
+    with open(path) as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSON array or JSON-lines file of listings")
+    parser.add_argument("--out", required=True, help="index directory (created or updated in place)")
+    parser.add_argument("--dim", type=int, default=DEFAULT_DIM, help="hashed dimensions for a new index")
+    parser.add_argument("--scrape", action="store_true", help="fetch missing personal statements")
+    args = parser.parse_args()
+
+    profiles = []
+    for listing in load_listings(args.input):
+        profile = TherapistProfile.from_listing(listing)
+        profile.personal_statement = listing.get("personalStatement", "")
+        profiles.append(profile)
+
+    if args.scrape:
+        from api.utils.tools import get_therapist_profile_data
+        missing = [profile for profile in profiles if not profile.personal_statement]
+        print(f"Scraping {len(missing)} personal statements...")
+        get_therapist_profile_data(missing)
+
+    started = time.perf_counter()
+    index = SemanticIndex(args.out, dim=args.dim)
+    before = len(index)
+    indexed = index.upsert_profiles(profiles)
+    index.flush()
+    elapsed = time.perf_counter() - started
+    print(f"Indexed {indexed} profiles in {elapsed:.2f}s "
+          f"({len(profiles) - indexed} without a statement skipped, "
+          f"{len(index) - before} new, {len(index)} total, dim {index.dim}) -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Import-time profile report for the serverless entry point.
+
+Runs `python -X importtime -c "import api.index"` in a fresh interpreter and
+prints the modules with the largest cumulative import cost, so it's obvious
+what a cold start is paying for.
+
+Usage:
+    python scripts/profile_imports.py [--top 25] [--module api.index]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(stderr):
+    """
+    Parse `-X importtime` output into (module, self_us, cumulative_us, depth) rows.
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="api.index", help="module to import (default: api.index)")
+    parser.add_argument("--top", type=int, default=25, help="number of modules to show")
+    args = parser.parse_args()
+
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {args.module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:], file=sys.stderr)
+        sys.exit(proc.returncode)
+
+    rows = parse_importtime(proc.stderr)
+    total = next((cumulative for name, _, cumulative, _ in rows if name == args.module), 0)
+
+    print(f"Import profile for {args.module}: {total / 1000:.1f} ms total, {len(rows)} modules\n")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for name, self_us, cumulative_us, depth in sorted(rows, key=lambda r: r[2], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {'  ' * depth}{name}")
+
+    top_level = {}
+    for name, _, cumulative_us, depth in rows:
+        if depth == 1:
+            package = name.split(".")[0]
+            top_level[package] = top_level.get(package, 0) + cumulative_us
+    print("\nBy top-level package:")
+    for package, cumulative_us in sorted(top_level.items(), key=lambda kv: kv[1], reverse=True)[:10]:
+        print(f"{cumulative_us / 1000:>14.1f}  {package}")
+
+
+if __name__ == "__main__":
+    main()